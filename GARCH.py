@@ -1,189 +1,396 @@
 import numpy as np
-import plotly.graph_objects as go
-import pandas as pd
-import random
+import math
+import os
+from typing import TYPE_CHECKING
 from loguru import logger
-from tqdm import tqdm
+from price_series import PriceSeries, Retention, decimate
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
 RETURN_RAND_CENTER = 0  # 0.005  # 0 for unbiased epsilon each period (std. dev of 1)
+SIM_BLOCK_SIZE = 4096  # number of periods of random variates drawn at once
+PAR_VALUE_INTERVAL = 1000  # par_value_set_trigger is called every this many periods
+SHOCK_INTERVAL = 2250  # sigma is multiplied by SHOCK_FACTOR once a week
+SHOCK_FACTOR = 8
+MC_CHUNK_PATHS = 128  # monte carlo paths simulated together, each chunk gets its own random stream
+
+
+class _RandomStream:
+    """Pre-drawn random variates for the simulation kernel
+
+    Variates are drawn SIM_BLOCK_SIZE periods at a time and handed out in order, so a seeded series is the
+    same whether it is simulated one period at a time or in large batches.
+    With paths set every variate is drawn as a (periods, paths) array instead.
+    """
+    def __init__(self, rng: np.random.Generator, block_size: int = SIM_BLOCK_SIZE, paths: int = None):
+        self.rng = rng
+        self.block_size = block_size
+        self.paths = paths
+        self._block = {}
+        self._pos = block_size
+        self._block_state = None  # bit generator state the current block was drawn from
+
+    def _refill(self):
+        n = self.block_size if self.paths is None else (self.block_size, self.paths)
+        rng = self.rng
+        self._block_state = rng.bit_generator.state
+        fun = rng.normal(2, 1, n)
+        self._block = {
+            "eps": rng.normal(RETURN_RAND_CENTER, 1, n),
+            "bias_ratio": 1 / rng.integers(3000, 4000, n, endpoint=True),
+            "fun": np.where(rng.integers(0, 1, n, endpoint=True) == 1, fun, 1.0),
+            "jump60": rng.integers(0, 499, n, endpoint=True) == 0,
+            "jump300": rng.integers(0, 2499, n, endpoint=True) == 0,
+            "jump20": rng.integers(0, 99, n, endpoint=True) == 0,
+        }
+        self._pos = 0
+
+    def take(self, n: int) -> dict[str, np.ndarray]:
+        """Next n periods of every variate"""
+        parts = []
+        while n:
+            if self._pos == self.block_size:
+                self._refill()
+            k = min(n, self.block_size - self._pos)
+            parts.append({name: values[self._pos:self._pos+k] for name, values in self._block.items()})
+            self._pos += k
+            n -= k
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    def get_state(self) -> dict:
+        """Position in the stream as plain json-able types, restore with set_state"""
+        return {"block_state": self._block_state, "pos": self._pos}
+
+    def set_state(self, state: dict):
+        """Continue with the same variates a saved stream would have handed out next"""
+        if state["block_state"] is None:
+            self._block, self._pos = {}, self.block_size
+            return
+        self.rng.bit_generator.state = state["block_state"]
+        self._refill()
+        self._pos = state["pos"]
+
+
+def _simulate_paths(a: float, b: float, c: float, sigma0: float, init_value: float, par_value: float,
+                    threshold: float, paths: int, n: int, rng: np.random.Generator,
+                    path_stats: bool = False) -> tuple[np.ndarray, float, dict[str, np.ndarray]]:
+    """Advance `paths` independent prices n periods together, same model as GARCH._sim_block
+
+    Par value is held fixed, as it is for every ProductiveAsset. Returns the cumulative return of each path
+    at period n-1, the total absolute bias generated and, with path_stats, each path's realized volatility
+    (standard deviation of its returns per period) and max drawdown (largest fall from a previous high).
+    """
+    stream = _RandomStream(rng, block_size=min(SIM_BLOCK_SIZE, max(n, 1)), paths=paths)
+    sigma = np.full(paths, sigma0)
+    r = np.zeros(paths)
+    cr = np.zeros(paths)
+    price = np.full(paths, float(init_value))
+    total_bias = 0.0
+    if path_stats:
+        sum_r = np.zeros(paths)
+        sum_r2 = np.zeros(paths)
+        peak = price.copy()
+        drawdown = np.zeros(paths)
+    for start in range(1, n, stream.block_size):
+        stop = min(n, start + stream.block_size)
+        draws = stream.take(stop - start)
+        for j, i in enumerate(range(start, stop)):
+            sigma = np.sqrt(a + b * r * r + c * sigma * sigma)
+            if i % SHOCK_INTERVAL == 0:  # each week
+                sigma *= SHOCK_FACTOR
+            r = sigma * draws["eps"][j]
+            if par_value:
+                percent_diff = (price - par_value) / par_value
+                abs_diff = np.abs(percent_diff)
+                bias = -(percent_diff - np.copysign(threshold, percent_diff)) * draws["bias_ratio"][j] * draws["fun"][j]
+                bias[abs_diff < threshold] = 0
+                bias[(abs_diff > 3 * threshold) & draws["jump60"][j]] *= 60
+                bias[(abs_diff > 6 * threshold) & draws["jump300"][j]] *= 300  # wheeeee
+                bias[(abs_diff > 8 * threshold) & draws["jump20"][j]] *= 20  # wheeeee
+                total_bias += np.abs(bias).sum()
+                r += bias
+            cr += r
+            price *= 1 + r
+            if path_stats:
+                sum_r += r
+                sum_r2 += r * r
+                np.maximum(peak, price, out=peak)
+                np.maximum(drawdown, 1 - price / peak, out=drawdown)
+    stats = {}
+    if path_stats:
+        periods = max(n - 1, 1)
+        mean = sum_r / periods
+        stats = {"volatility": np.sqrt(np.maximum(sum_r2 / periods - mean * mean, 0)), "max_drawdown": drawdown}
+    return cr, float(total_bias), stats
+
+
+def _monte_carlo_chunk(args: tuple) -> tuple[np.ndarray, float, dict[str, np.ndarray]]:
+    """_simulate_paths for one chunk of paths, args end with path_stats and the chunk's SeedSequence
+    (runs in a worker process)"""
+    *params, path_stats, seed_seq = args
+    return _simulate_paths(*params, np.random.default_rng(seed_seq), path_stats=path_stats)
+
+
+def price_figure(periods: np.ndarray, prices: np.ndarray, points: int = None) -> "go.Figure":
+    """Line chart of prices, downsampled to at most `points` points"""
+    import plotly.graph_objects as go  # slow to import, only loaded once a chart is drawn
+    if points:
+        periods, prices = decimate(periods, prices, points)
+    fig = go.Figure(
+        data=go.Scatter(
+            x=periods,
+            y=prices,
+            mode='lines',
+            line_shape='spline'
+        )
+    )
+    return fig
+
 
 class GARCH:
     """
     Asset price simulated with a Generalized Auto-Regressive Conditional Heteroskedasticity (GARCH) model.
     """
-    def __init__(self, init_value: int = 100, b: float = 0.3, c: float = 0.3):
+    def __init__(self, init_value: int = 100, b: float = 0.3, c: float = 0.3, seed=None,
+                 retention: Retention = Retention()):
         self.init_value = init_value
         self.par_value = init_value
         self.b = b  # ARCH coefficient
         self.c = c  # GARCH coefficient
         self.sigma0 = 0.0002
         self.a = 0.0000002  # 0.0000002
-        self.eps = np.random.normal(RETURN_RAND_CENTER, 1, 2)  # init sims to length 2, later runs fn to sim to len 10
-        self.r = np.zeros(2)
-        self.cr = np.zeros(2)
-        self.sigma = np.ones(2) * self.sigma0
-        self._price_history = np.ones(2) * self.init_value
-        self.total_bias_generated = 0
-        self.get_price(100)  # sim to period 100
-    
-    def _get_return_drift(self, price):
-        """ Input cumulative return, output price bias """
-        if not self.par_value:
-            return 0
-        # c_ret = 1 + c_ret
-        # price = c_ret * self.init_value
-        ## These are some defaults, should probably make them variable
         self.bias_threshold = 0.05  # % price difference from par before bias begins
-        self.bias_ratio = 1/(random.randint(3000, 4000))  # ratio of the % from par_value to bias
-        #
-        percent_diff = (price - self.par_value) / self.par_value
-        if abs(percent_diff) < self.bias_threshold:
-            return 0
-        if percent_diff < 0:
-            adjusted_diff = percent_diff + self.bias_threshold
-        else:
-            adjusted_diff = percent_diff - self.bias_threshold
-        # print(f"Biasing price {price} return: {(-percent_diff * self.bias_ratio)}")
-        # experimenting with this to try and make the bias more subtle:
-        bias = (-adjusted_diff * self.bias_ratio)
-        # bias = (-percent_diff * self.bias_ratio)
-        if random.randint(0, 1):
-            bias = bias * np.random.normal(2)  # add some fun :)
-        if abs(percent_diff) > 3 * self.bias_threshold and random.randint(0, 499) == 0:
-            bias = bias * 60
-        if abs(percent_diff) > 6 * self.bias_threshold and random.randint(0, 2499) == 0:
-            bias = bias * 300  # wheeeee
-            # bias = (-percent_diff * (0.1 + (0.1 * random.random())))
-            logger.debug(f"bias greatly increased to {bias}")
-        if abs(percent_diff) > 8 * self.bias_threshold and random.randint(0, 99) == 0:
-            bias = bias * 20  # wheeeee
-        self.total_bias_generated += abs(bias)
-        return bias
-
-    def _get_eps_at_period(self, period) -> float:
-        """ Generate epsilon values up to period """
-        try:
-            return self.eps[period]
-        except IndexError:
-            new_n = 1 + period - len(self.eps)  # number of new values we need to generate
-            new_eps = np.random.normal(RETURN_RAND_CENTER, 1, new_n)
-            old_eps = self.eps
-            self.eps = np.concatenate((old_eps, new_eps))
-            return self.eps[period]
+        self._random = _RandomStream(np.random.default_rng(seed))
+        self._series = PriceSeries(retention=retention)
+        # period 0 is the initial value, everything after it is simulated on demand
+        init = self._series.extend(1)
+        init["eps"][0] = self._random.take(1)["eps"][0]
+        init["sigma"][0] = self.sigma0
+        init["r"][0] = 0
+        init["cr"][0] = 0
+        init["price"][0] = self.init_value
+        self.total_bias_generated = 0
+
+    # full resolution columns, index 0 is period self._series.offset
+    @property
+    def eps(self) -> np.ndarray:
+        return self._series.view("eps")
+
+    @property
+    def sigma(self) -> np.ndarray:
+        return self._series.view("sigma")
+
+    @property
+    def r(self) -> np.ndarray:
+        return self._series.view("r")
+
+    @property
+    def cr(self) -> np.ndarray:
+        return self._series.view("cr")
 
+    @property
+    def _price_history(self) -> np.ndarray:
+        return self._series.view("price")
+    
     def par_value_set_trigger(self, period):
         """ Override this function """
         # print("Override this function")
-        logger.info(f"Setting par value to {self._price_history[period-1]} at period {period}")
+        logger.info(f"Setting par value to {self._series.price_at(period-1)} at period {period}")
         # set current price as par value
-        self.par_value = self._price_history[period-1]
+        self.par_value = self._series.price_at(period-1)
 
     def _sim_to_period(self, period) -> float:
         """ Generate self.r and self.sigma values up to period """
-        try:
-            # see if the data already exists
-            self.sigma[period]
-            self.r[period]
-            self.cr[period]
-        except IndexError:
-            self._get_eps_at_period(period)
-            new_n = 1 + period - len(self.sigma)
-            old_sigma = self.sigma
-            self.sigma = np.concatenate((old_sigma, np.ones(new_n)*self.sigma0))
-
-            old_len = len(self.r)
-            old_r = self.r
-            old_cr = self.cr
-            old_price_history = self._price_history
-            self.r = np.concatenate((old_r, np.zeros(new_n)))
-            self.cr = np.concatenate((old_cr, np.zeros(new_n)))
-            self._price_history = np.concatenate((old_price_history, np.ones(new_n)))
-
-            for i in range(old_len-1, period+1):
-                if i % 1000 == 0:
-                    pv = self.par_value_set_trigger(i)
-                    # this method sets, no need for the following
-                    # if pv:
-                    #     self.par_value = pv
-                    #     logger.warning(f"DEBUG: Setting par value to {self.par_value} at pd {i}")
-                    # self.par_value = self.init_value + (i/1000)
-                self.sigma[i] = np.sqrt(self.a + self.b * self.r[i-1] ** 2 + self.c * self.sigma[i-1] ** 2)
-                # self.eps[i] += return drift
-                if i % 2250 == 0:  # each week
-                    self.sigma[i] = self.sigma[i] * 8
-                self.r[i] = self.sigma[i] * self.eps[i]
-                self.cr[i] = self.cr[i-1] + self.r[i]
-                last_price = self._price_history[i-1]
-                bias = self._get_return_drift(last_price)
-                self.r[i] += bias
-                self.cr[i] += bias
-                self._price_history[i] = last_price * (1 + self.r[i])
-                # self.r[i] += self._get_return_drift(self.r)
-            return self.r[period]
+        old_len = len(self._series)
+        if period < old_len:
+            # the data already exists
+            return self._series.value_at("r", period)
+        cols = self._series.extend(1 + period - old_len)
+        start = old_len
+        while start <= period:
+            if start % PAR_VALUE_INTERVAL == 0:
+                self.par_value_set_trigger(start)
+            # run up to the next par value trigger, it needs the price history before it
+            stop = min(period + 1, (start // PAR_VALUE_INTERVAL + 1) * PAR_VALUE_INTERVAL)
+            self._sim_block(start, stop, cols)
+            start = stop
+        r = self._series.value_at("r", period)
+        self._series.compact()
+        return r
+
+    def _sim_block(self, start: int, stop: int, cols: dict[str, np.ndarray]):
+        """Simulate periods [start, stop) into cols, whose index 0 is period self._series.offset
+
+        All random variates for the block are drawn up front, the recursion itself runs on plain floats.
+        """
+        n = stop - start
+        draws = self._random.take(n)
+        eps = draws["eps"].tolist()
+        bias_ratio = draws["bias_ratio"].tolist()
+        fun = draws["fun"].tolist()
+        jump60 = draws["jump60"].tolist()
+        jump300 = draws["jump300"].tolist()
+        jump20 = draws["jump20"].tolist()
+        lo, hi = start - self._series.offset, stop - self._series.offset
+        a, b, c = self.a, self.b, self.c
+        par_value = self.par_value
+        threshold = self.bias_threshold
+        sqrt = math.sqrt
+
+        sigma_out = [0.0] * n
+        r_out = [0.0] * n
+        cr_out = [0.0] * n
+        price_out = [0.0] * n
+        r_prev = float(cols["r"][lo-1])
+        sigma_prev = float(cols["sigma"][lo-1])
+        cr_prev = float(cols["cr"][lo-1])
+        price_prev = float(cols["price"][lo-1])
+        total_bias = 0.0
+        for j in range(n):
+            sigma_i = sqrt(a + b * r_prev * r_prev + c * sigma_prev * sigma_prev)
+            if (start + j) % SHOCK_INTERVAL == 0:  # each week
+                sigma_i *= SHOCK_FACTOR
+            r_i = sigma_i * eps[j]
+            if par_value:
+                percent_diff = (price_prev - par_value) / par_value
+                abs_diff = abs(percent_diff)
+                if abs_diff >= threshold:
+                    if percent_diff < 0:
+                        bias = -(percent_diff + threshold) * bias_ratio[j]
+                    else:
+                        bias = -(percent_diff - threshold) * bias_ratio[j]
+                    bias *= fun[j]  # add some fun :)
+                    if abs_diff > 3 * threshold and jump60[j]:
+                        bias *= 60
+                    if abs_diff > 6 * threshold and jump300[j]:
+                        bias *= 300  # wheeeee
+                        logger.debug(f"bias greatly increased to {bias}")
+                    if abs_diff > 8 * threshold and jump20[j]:
+                        bias *= 20  # wheeeee
+                    total_bias += abs(bias)
+                    r_i += bias
+            cr_prev += r_i
+            price_prev = price_prev * (1 + r_i)
+            sigma_out[j] = sigma_prev = sigma_i
+            r_out[j] = r_prev = r_i
+            cr_out[j] = cr_prev
+            price_out[j] = price_prev
+
+        cols["eps"][lo:hi] = eps
+        cols["sigma"][lo:hi] = sigma_out
+        cols["r"][lo:hi] = r_out
+        cols["cr"][lo:hi] = cr_out
+        cols["price"][lo:hi] = price_out
+        self.total_bias_generated += total_bias
 
     def get_price(self, period: int = None) -> float:
         if period is None:
-            period = len(self._price_history) - 1
-        try:
-            price = self._price_history[period]
-        except IndexError:
+            period = len(self._series) - 1
+        if period >= len(self._series):
             self._sim_to_period(period)
-            price = self._price_history[period]
-        return price.tolist()  # convert to native python type (float)
+        return self._series.price_at(period).tolist()  # convert to native python type (float)
     
+    @property
+    def history_nbytes(self) -> int:
+        """Memory held by the simulated history, full resolution columns and compacted bars"""
+        return self._series.nbytes
+
+    def get_series_state(self) -> tuple[dict, dict[str, np.ndarray]]:
+        """(meta, arrays) describing the simulated history, restore with restore_series"""
+        meta = self._series.get_meta()
+        meta["par_value"] = float(self.par_value)
+        meta["total_bias_generated"] = float(self.total_bias_generated)
+        meta["random"] = self._random.get_state()
+        return meta, self._series.get_arrays()
+
+    def restore_series(self, meta: dict, arrays: dict[str, np.ndarray]):
+        """Replace the simulated history with one saved by get_series_state, no re-simulation needed"""
+        self._series = PriceSeries.from_arrays(meta, arrays)
+        self.par_value = meta["par_value"]
+        self.total_bias_generated = meta["total_bias_generated"]
+        self._random.set_state(meta["random"])
+
     def get_next_price(self) -> float:
         return self.get_price()
         
 
-    def gen_price_figure(self, start_period: int, end_period: int) -> go.Figure:
-        """like range(), start is inclusive and end is exclusive"""
-        self.get_price(end_period)  # make sure we've got the data up to that period
-        fig = go.Figure(
-            data=go.Scatter(
-                x=[i for i in range(start_period, end_period)],
-                y=[p for p in self._price_history[start_period:end_period]],
-                mode='lines',
-                line_shape='spline'
-            )
-        )
-        return fig
-
-    def simulate_price(self, n: int = 3600) -> float:
-        eps = np.random.normal(RETURN_RAND_CENTER, 1, n)
-        sigma = np.ones(n) * self.sigma0
-        r = np.zeros(n)
-        cr = np.zeros(n)
-        for i in range(1,n):
-            #print(i)
-            # a + b*(y^2)_(t-1) + c*(sig^2)_(t-1)
-            sigma[i] = np.sqrt(self.a + self.b * r[i-1] ** 2 + self.c * sigma[i-1] ** 2)
-            #print(f"sigma is {sigma[i]}")
-            r[i] = sigma[i] * eps[i]  # this period return
-            cr[i] = cr[i-1] + r[i]
-            bias = self._get_return_drift(self.init_value * cr[i])
-            if i % 1000 == 0 and bias > 0.01:
-                logger.warning(f"warn: bias is {round(bias, 4)}; cr[i] is {round(cr[i], 4)}, r[i] was {round(r[i], 4)}")
-            r[i] += bias
-            cr[i] += bias
-        # cr = np.cumsum(r) + 1  # cumulative returns
-        return cr[n-1]
+    def gen_price_figure(self, start_period: int, end_period: int, points: int = None) -> "go.Figure":
+        """like range(), start is inclusive and end is exclusive
+        compacted history is drawn from the close of each bar
+        points caps the number of points drawn, keeping the min and max of each bucket"""
+        x, y = self.get_prices(start_period, end_period)
+        return price_figure(x, y, points)
+
+    @property
+    def history_layout(self) -> tuple:
+        """See PriceSeries.layout"""
+        return self._series.layout
+
+    @property
+    def retention(self) -> Retention:
+        """How much of the series is kept at full resolution, None for all of it"""
+        return self._series.retention
+
+    def get_prices(self, start_period: int, end_period: int) -> tuple[np.ndarray, np.ndarray]:
+        """(periods, prices) like range(), compacted history gives one point per bar"""
+        self.get_price(end_period - 1)  # make sure we've got the data up to that period
+        return self._series.closes(start_period, end_period)
+
+    def simulate_price(self, n: int = 3600, seed=None) -> float:
+        """Cumulative return of one simulated path of length n"""
+        return self.monte_carlo(it=1, n=n, seed=seed, distribution=True)["distribution"][0] / 100
     
-    def monte_carlo(self, it: int = 100, n: int = 3600) -> dict:
+    def monte_carlo_jobs(self, it: int, n: int, seed_seq: np.random.SeedSequence, chunk_size: int = MC_CHUNK_PATHS,
+                         path_stats: bool = False) -> list[tuple]:
+        """Arguments to _monte_carlo_chunk for each chunk of it paths of length n with this asset's parameters"""
+        sizes = [min(chunk_size, it - start) for start in range(0, it, chunk_size)]
+        params = (self.a, self.b, self.c, self.sigma0, self.init_value, self.par_value, self.bias_threshold)
+        return [(*params, size, n, path_stats, child) for size, child in zip(sizes, seed_seq.spawn(len(sizes)))]
+
+    def monte_carlo(self, it: int = 100, n: int = 3600, seed=None, distribution: bool = False,
+                    workers: int = 1, chunk_size: int = MC_CHUNK_PATHS) -> dict:
+        """Simulate it paths of length n and summarize their cumulative returns (in %)
+        distribution=True also returns every path's terminal return
+        'bias' is total_bias_generated, all the bias this asset has generated so far including this run,
+        'run_bias' is just this run's
+
+        Paths are simulated together in chunks of chunk_size, each with a random stream spawned from seed,
+        and the chunks are spread over `workers` processes, one per core (os.cpu_count()) for workers=None.
+        The result only depends on seed and chunk_size, never on the number of workers.
+        """
         logger.info(f"Simulating {it} outcomes of length {n} - {n*it} total periods...")
-        cr_list = []
-        for i in tqdm(range(it)):  # tqdm() to make a loading bar
-            cr_list.append(self.simulate_price(n=n))
+        seed_seq = np.random.SeedSequence(seed)
+        jobs = self.monte_carlo_jobs(it, n, seed_seq, chunk_size)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers > 1 and len(jobs) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                chunks = list(pool.map(_monte_carlo_chunk, jobs))
+        else:
+            chunks = [_monte_carlo_chunk(job) for job in jobs]
         logger.success("Done!")
-        cr_list = [(x)*100 for x in cr_list]
+        cr_list = np.concatenate([cr for cr, _, _ in chunks])
+        # bias is generated in the workers, so it is summed here rather than on self in each process
+        bias = sum(chunk_bias for _, chunk_bias, _ in chunks)
+        self.total_bias_generated += bias
+        cr_list = cr_list * 100
         returns = {
             'iterations': it,
             'length': n,
-            'max': round(max(cr_list), 2),
-            'avg': round(sum(cr_list)/len(cr_list), 2),
-            'min': round(min(cr_list), 2),
+            'max': round(float(cr_list.max()), 2),
+            'avg': round(float(cr_list.mean()), 2),
+            'min': round(float(cr_list.min()), 2),
             'bias': self.total_bias_generated,
-            'quint': pd.qcut(cr_list, 4, retbins=True)[1]
+            'run_bias': bias,
+            'quint': np.quantile(cr_list, [0, 0.25, 0.5, 0.75, 1]),
+            'seed': seed_seq.entropy
         }
+        if distribution:
+            returns['distribution'] = cr_list
         return returns
         # print(f"maximum return is {round(max(cr_list), 2)} %")
         # print(f"average return is {round(sum(cr_list)/len(cr_list), 2)} %")
@@ -191,6 +398,7 @@ class GARCH:
 
 
 if __name__ == '__main__':
+    # one parameter set at a time, calibrate.py sweeps a whole grid of them across every core
 
     # rh = RobinhoodAPIHelper()
     # aapl_json = rh.get_info_by_symbol('AAPL')
@@ -198,7 +406,7 @@ if __name__ == '__main__':
     b, c = 0.35, 0.2
     print(f"b={b}; c={c}")
     my_asset = GARCH(100, b=b, c=c)
-    # print(my_asset.monte_carlo(it=100, n=86400))  # 14400 seconds is 4 hours, 86400 seconds is 1 day, 432000 seconds is 5 days
+    # print(my_asset.monte_carlo(it=100, n=86400, workers=None))  # 14400 seconds is 4 hours, 86400 seconds is 1 day, 432000 seconds is 5 days
     # 14400 minutes is 10 days tho, 13680 in 2 months
     # 450 trading minutes per day, 2250 per week, 9000 per month, 36000 per quarter
     # for period=5min; 90 for 1 trading day, 450/wk, 1800/month, 21600/yr
@@ -1,14 +1,63 @@
-from flask import Flask, abort, session, request, redirect, url_for
-from markupsafe import escape
+from flask import Flask, abort, g, session, request, redirect, url_for
+from functools import lru_cache
+import os
 import secrets
-import yfinance as yf
-from game import Game
-from assets import InsufficientResources, NoRecipe
+import sys
+import time
+from loguru import logger
+from game import Game, PopulationSettler
+from clock import GameClock
+from store import SQLiteStore
+from feed import PriceBroadcaster
+from snapshot import TradeJournal, Snapshotter, latest_snapshot, load_snapshot
+from assets import InsufficientResources, MarketNotStarted, NoRecipe, OrderRejected
+from planner import PLAN_HORIZON, Planner
+from leaderboard import LEADERBOARD_SIZE, Leaderboard
+from metrics import REGISTRY, REQUEST_SECONDS, watch_game
 
 
 app = Flask(__name__)
-game = Game()
-game.increment_time(10)
+# per-trade messages are DEBUG, WIDGET_LOG_LEVEL=DEBUG to see them
+logger.remove()
+logger.add(sys.stderr, level=os.environ.get("WIDGET_LOG_LEVEL", "INFO"))
+# advance one period every WIDGET_PERIOD_SECONDS of wall-clock time
+clock = None
+# WIDGET_SEED makes a new world's prices reproducible
+seed = int(os.environ["WIDGET_SEED"]) if os.environ.get("WIDGET_SEED") else None
+# every streaming subscriber is fed from this one broadcaster
+price_feed = PriceBroadcaster()
+if os.environ.get("WIDGET_STORE"):
+    # shared with every other worker, time is advanced by a separate `python clock.py` process
+    game = Game(store=SQLiteStore(os.environ["WIDGET_STORE"]))
+    price_feed.follow(game.market, interval=float(os.environ.get("WIDGET_PERIOD_SECONDS", 1)))
+else:
+    snapshot_dir = os.environ.get("WIDGET_SNAPSHOT_DIR")
+    journal = TradeJournal(os.path.join(snapshot_dir, "trades.jsonl")) if snapshot_dir else None
+    if snapshot_dir and latest_snapshot(snapshot_dir):
+        # carry on from the last snapshot and every trade made since
+        game = load_snapshot(snapshot_dir, journal)
+    else:
+        game = Game(seed=seed)
+        game.increment_time(10)
+    game.journal = journal
+    clock = GameClock(game, period_seconds=float(os.environ.get("WIDGET_PERIOD_SECONDS", 1)))
+    clock.listeners.append(price_feed)
+    # everyone's production made at once every WIDGET_SETTLE_PERIODS, before the leaderboard values it
+    clock.listeners.append(PopulationSettler(every=int(os.environ.get("WIDGET_SETTLE_PERIODS", 60))))
+    # ranked from every investor's holdings once per tick, and re-ranked as they trade
+    game.leaderboard = Leaderboard(game)
+    game.leaderboard.refresh()
+    clock.listeners.append(game.leaderboard)
+    price_feed.publish(game.market.snapshot)
+    if snapshot_dir:
+        clock.listeners.append(Snapshotter(snapshot_dir, every=int(os.environ.get("WIDGET_SNAPSHOT_PERIODS", 1000))))
+    clock.start()
+
+planner = Planner(game.market)
+watch_game(game)
+if clock is not None:
+    REGISTRY.gauge("widget_clock_lag_seconds", "Seconds the game is behind the wall clock",
+                   callback=lambda: {(): clock.lag})
 
 # Set the secret key to some random bytes. Keep this really secret!
 app.secret_key = secrets.token_bytes()
@@ -40,14 +89,47 @@ def return_status(code: int, reason: str) -> tuple[dict, int]:
                 "message": "Bad Request",
                 "reason": reason
             }, 400
+        elif code == 503:
+            return {
+                "status": 503,
+                "message": "Service Unavailable",
+                "reason": reason
+            }, 503
     elif type(reason) == dict:
-        # if we're getting a dict here we expect it to also be 200
         if code == 200:
             template = {
                 "status": 200,
                 "message": "OK"
             }
-        return {**template, **reason}
+        elif code == 400:
+            template = {
+                "status": 400,
+                "message": "Bad Request"
+            }
+        return {**template, **reason}, code
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    if game.store is not None:
+        # one look at the store's period per request, every read of the snapshot after it is free
+        game.market.refresh()
+
+@app.errorhandler(MarketNotStarted)
+def market_not_started(exc):
+    return return_status(503, exc)
+
+@app.after_request
+def record_latency(response):
+    # labelled by route pattern rather than path so every symbol shares one series
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, request.method, route, response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format"""
+    return app.response_class(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/')
 def index():
@@ -93,84 +175,241 @@ def cui():
 
 @app.route('/asset/<string:symbol>')
 def asset_price(symbol):
-    try:
-        investor = game.get_investor(session["username"])
-    except KeyError:
+    if "username" not in session:
         return redirect(url_for("login"))
     try:
-        price = investor.portfolio.productive_assets[symbol].get_price()
+        price = game.market.get_price(symbol)
         return return_status(200, {"asset": symbol, "price": price})
     except KeyError:
         return return_status(400, f"Asset {symbol} does not exist")
     except InsufficientResources as exc:
         return return_status(400, exc)
 
+@app.route('/stream/prices')
+def price_stream():
+    """Server-sent events, one per period with every symbol's price"""
+    if "username" not in session:
+        return redirect(url_for("login"))
+    return app.response_class(
+        price_feed.subscribe(), mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@lru_cache(maxsize=256)
+def render_chart(symbol: str, start: int, end: int, points: int, layout: tuple) -> str:
+    """Plotly figure json for a price chart. Simulated prices never change, but compaction folds old ones
+    into bars, so it's cached per layout of the symbol's history as well as per range."""
+    return game.market.gen_price_figure(symbol, start, end, points=points).to_json()
+
+@app.route('/asset/<string:symbol>/chart')
+def asset_chart(symbol):
+    if "username" not in session:
+        return redirect(url_for("login"))
+    if symbol not in game.market.assets:
+        return return_status(400, f"Asset {symbol} does not exist")
+    # never chart past the current period, those prices aren't public yet
+    end = min(request.args.get("end", game.current_period + 1, type=int), game.current_period + 1)
+    start = request.args.get("start", max(0, end - 21600), type=int)
+    points = request.args.get("points", 1000, type=int)
+    if start < 0 or start >= end or points < 2:
+        return return_status(400, "Chart needs 0 <= start < end and at least 2 points")
+    layout = game.market.assets[symbol].history_layout
+    return app.response_class(render_chart(symbol, start, end, points, layout), mimetype="application/json")
+
+def get_qty() -> int:
+    """qty query parameter, defaults to 1 when it's absent"""
+    if "qty" not in request.args:
+        return 1
+    try:
+        qty = int(request.args["qty"])
+    except ValueError:
+        raise ValueError("qty must be a positive integer") from None
+    if qty < 1:
+        raise ValueError("qty must be a positive integer")
+    return qty
+
 @app.route('/asset/<string:symbol>/buy')
 def buy_asset(symbol):
-    try:
-        print("getting investor")
-        investor = game.get_investor(session["username"])
-        print("done getting investor")
-    except KeyError:
+    if "username" not in session:
         return redirect(url_for("login"))
     try:
-        print("buying asset")
-        investor.portfolio.buy_asset(symbol, 1)
-        print("done buying asset")
-        return return_status(200, f"Bought 1 {symbol}")
+        qty = get_qty()
+        with game.investor(session["username"]) as investor:
+            price = investor.portfolio.buy_asset(symbol, qty)
+            game.record(session["username"], investor, "buy", symbol, qty, price)
+        logger.debug("{} bought {} {} at {}", session["username"], qty, symbol, price)
+        return return_status(200, f"Bought {qty} {symbol}")
     except KeyError:
-        print("kleyerror")
         return return_status(400, f"Asset {symbol} does not exist")
-    except InsufficientResources as exc:
-        print(f"exception: {exc}")
-        print(type(exc))
+    except (InsufficientResources, ValueError) as exc:
+        logger.debug("{} failed to buy {}: {}", session["username"], symbol, exc)
         return return_status(400, exc)
-    except Exception as exc:
-        print(f"exception: {exc}")
-        return exc, 500
 
 @app.route('/asset/<string:symbol>/sell')
 def sell_asset(symbol):
-    try:
-        investor = game.get_investor(session["username"])
-    except KeyError:
+    if "username" not in session:
         return redirect(url_for("login"))
     try:
-        investor.portfolio.sell_asset(symbol, 1)
-        return return_status(200, f"Sold 1 {symbol}")
+        qty = get_qty()
+        with game.investor(session["username"]) as investor:
+            price = investor.portfolio.sell_asset(symbol, qty)
+            game.record(session["username"], investor, "sell", symbol, qty, price)
+        return return_status(200, f"Sold {qty} {symbol}")
     except KeyError:
         return return_status(400, f"Asset {symbol} does not exist")
-    except InsufficientResources as exc:
+    except (InsufficientResources, ValueError) as exc:
         return return_status(400, exc)
 
 @app.route('/asset/<string:symbol>/produce')
 def produce_asset(symbol):
-    try:
-        investor = game.get_investor(session["username"])
-    except KeyError:
+    if "username" not in session:
         return redirect(url_for("login"))
     try:
-        investor.produce_asset(symbol, 1)
-        return return_status(202, f"Queued production of 1 {symbol}")
+        qty = get_qty()
+        # ?autobuy=1 buys any missing ingredients at the current price first
+        autobuy = request.args.get("autobuy", 0, type=int) == 1
+        with game.investor(session["username"]) as investor:
+            bought = investor.produce_asset(symbol, qty, autobuy=autobuy)
+            game.record_produce(session["username"], investor, symbol, qty, bought)
+        return return_status(202, f"Queued production of {qty} {symbol}")
     except KeyError:
         return return_status(400, f"Asset {symbol} does not exist")
-    except (InsufficientResources, NoRecipe) as exc:
+    except (InsufficientResources, NoRecipe, ValueError) as exc:
         return return_status(400, exc)
 
-@app.route('/info/portfolio')
-def portfolio_info():
+@app.route('/orders', methods=['POST'])
+def orders():
+    """Apply a json list of {"action": buy/sell/produce, "symbol", "qty"} orders, all or nothing"""
+    if "username" not in session:
+        return redirect(url_for("login"))
+    order_list = request.get_json(silent=True)
+    if type(order_list) != list or not all(type(order) == dict for order in order_list):
+        return return_status(400, "Expected a json list of orders")
+    snapshot = game.market.snapshot
+    try:
+        with game.investor(session["username"]) as investor:
+            results = investor.apply_orders(order_list, snapshot)
+            for result in results:
+                order = result["order"]
+                game.record(session["username"], investor, order["action"], order["symbol"], order["qty"],
+                            result.get("price"))
+        return return_status(200, {"period": snapshot.period, "orders": results})
+    except OrderRejected as exc:
+        return return_status(400, {"reason": str(exc), "period": snapshot.period, "orders": exc.results})
+
+@app.route('/orders/resting', methods=['GET', 'POST'])
+def resting_orders():
+    """GET your resting orders and recently finished ones, POST a json
+    {"action": buy/sell/produce, "symbol", "qty", "order_type": limit/stop, "price"} order to rest until the price
+    crosses it"""
+    if "username" not in session:
+        return redirect(url_for("login"))
+    if request.method == "GET":
+        username = session["username"]
+        return return_status(200, {"orders": game.orders.get_orders(username),
+                                   "history": game.orders.get_history(username)})
+    order = request.get_json(silent=True)
+    if type(order) != dict:
+        return return_status(400, "Expected a json order")
     try:
-        investor = game.get_investor(session["username"])
+        with game.investor(session["username"]) as investor:
+            placed = game.place_order(session["username"], investor, order.get("action"), order.get("symbol"),
+                                      order.get("qty"), order.get("order_type", "limit"), order.get("price"))
+        return return_status(200, {"order": placed.get_order_info()})
+    except (NoRecipe, ValueError) as exc:
+        return return_status(400, exc)
+
+@app.route('/orders/resting/<int:order_id>', methods=['DELETE'])
+def cancel_resting_order(order_id):
+    if "username" not in session:
+        return redirect(url_for("login"))
+    try:
+        with game.investor(session["username"]) as investor:
+            order = game.cancel_order(session["username"], investor, order_id)
+        return return_status(200, {"order": order.get_order_info()})
     except KeyError:
+        return return_status(400, f"You have no resting order {order_id}")
+
+@app.route('/info/portfolio')
+def portfolio_info():
+    if "username" not in session:
         return redirect(url_for("login"))
-    pi = investor.portfolio.get_portfolio_info()
+    snapshot = game.market.snapshot
+    with game.investor(session["username"], read_only=True) as investor:
+        pi = investor.portfolio.get_portfolio_info()
+        pi["net_worth"] = investor.net_worth(snapshot)
+        pi["income"] = investor.income(snapshot)
+    pi["period"] = snapshot.period
     return return_status(200, pi)
 
+@app.route('/info/market')
+def info_market():
+    """Every price at the current period, from the market's price vector"""
+    if "username" not in session:
+        return redirect(url_for("login"))
+    snapshot = game.market.snapshot
+    prices = dict(zip(game.market.symbols, game.market.price_vector(snapshot).tolist()))
+    return return_status(200, {"period": snapshot.period, "prices": prices})
+
+@app.route('/plan')
+def plan():
+    """Margin of every recipe and a greedy production plan (see Planner.recommend) for the investor's holdings
+    and cash over the next ?horizon periods. The orders can be posted to /orders as they are."""
+    if "username" not in session:
+        return redirect(url_for("login"))
+    horizon = request.args.get("horizon", PLAN_HORIZON, type=int)
+    if horizon < 1:
+        return return_status(400, "horizon must be a positive integer")
+    snapshot = game.market.snapshot
+    with game.investor(session["username"], read_only=True) as investor:
+        holdings, money = dict(investor.portfolio.holdings), investor.portfolio.money
+    recommendation = planner.recommend(holdings, money, horizon, snapshot)
+    return return_status(200, {"period": snapshot.period, "margins": planner.margins(snapshot), **recommendation})
+
+@app.route('/leaderboard')
+def leaderboard():
+    """The ?top richest investors by net worth, at most LEADERBOARD_SIZE"""
+    if "username" not in session:
+        return redirect(url_for("login"))
+    if game.leaderboard is None:
+        return return_status(400, "The leaderboard is not supported with a shared store")
+    top = request.args.get("top", LEADERBOARD_SIZE, type=int)
+    if top < 1:
+        return return_status(400, "top must be a positive integer")
+    ranking = game.leaderboard.top(top)
+    return return_status(200, {"period": game.leaderboard.period, "leaderboard": ranking})
+
 @app.route('/info/queue')
 def info_recipe_queue():
-    try:
-        investor = game.get_investor(session["username"])
-    except KeyError:
+    if "username" not in session:
+        return redirect(url_for("login"))
+    with game.investor(session["username"], read_only=True) as investor:
+        pq = investor.get_prod_queue()
+    return return_status(200, {"queue": pq})
+
+@app.route('/factories', methods=['GET', 'POST'])
+def factories():
+    """GET your factories and their queues, POST a json {"kind": refinery/processor, "lines"} to build one"""
+    if "username" not in session:
         return redirect(url_for("login"))
-    pq = investor.get_prod_queue()
-    return return_status(200, pq)
+    if request.method == "GET":
+        with game.investor(session["username"], read_only=True) as investor:
+            built = investor.get_factories()
+        return return_status(200, {"factories": built})
+    factory = request.get_json(silent=True)
+    if type(factory) != dict:
+        return return_status(400, "Expected a json factory")
+    kind, lines = factory.get("kind"), factory.get("lines", 1)
+    try:
+        with game.investor(session["username"]) as investor:
+            cost = investor.build_factory(kind, lines)
+            game.record(session["username"], investor, "build", kind, lines, cost)
+        return return_status(200, f"Built a {kind} with {lines} lines for {cost}")
+    except (InsufficientResources, ValueError) as exc:
+        return return_status(400, exc)
+
+@app.route('/info/clock')
+def clock_info():
+    if clock is None:
+        return return_status(200, {"period": game.current_period, "running": False})
+    return return_status(200, clock.get_clock_info())
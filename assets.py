@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from GARCH import GARCH
+from holdings import HoldingsTable, Row
 
 class InsufficientResources(Exception):
     pass
@@ -7,74 +8,91 @@ class InsufficientResources(Exception):
 class NoRecipe(Exception):
     pass
 
+class MarketNotStarted(Exception):
+    """A shared market's clock process hasn't written any prices yet"""
+    pass
+
+class OrderRejected(Exception):
+    """A batch of orders was rolled back, results has an entry per order"""
+    def __init__(self, reason: str, results: list[dict]):
+        super().__init__(reason)
+        self.results = results
+
 @dataclass()
 class AssetQty:
     name: str
     qty: int
 
 class AssetPortfolio():
-    """Container for a bunch of assets"""
-    def __init__(self):
+    """Holdings and cash for one investor, priced against a shared Market
+
+    Both live in the investor's row of a HoldingsTable, a table of its own unless one is given."""
+    def __init__(self, market, row: Row = None):
+        self.market = market
+        if row is None:
+            row = HoldingsTable(market.symbols, market.products, block_rows=1).add_row()
+        self._row = row
+        self.holdings = row.holdings_view()
         self.money = 1000
-        self.productive_assets = {
-            "obtainium": Obtainium(),
-            "eludium": Eludium(),
-            "unobtainium": Unobtainium(),
-            "widget": Widget(),
-            "gizmo": Gizmo(),
-            "doohickey": Doohickey(),
-            "gadget": Gadget()
-        }
+
+    @property
+    def money(self) -> float:
+        return self._row.block.money.item(self._row.index)
+
+    @money.setter
+    def money(self, value: float):
+        self._row.block.money[self._row.index] = value
+    
+    def get_qty(self, asset_name: str) -> int:
+        row = self._row
+        return row.block.holdings.item(row.index, row.block.asset_columns[asset_name])
+    
+    def set_qty(self, asset_name: str, value: int):
+        row = self._row
+        column = row.block.asset_columns[asset_name]  # KeyError for an unknown asset
+        if value < 0:
+            raise InsufficientResources("Can not reduce asset quantity below zero")
+        row.block.holdings[row.index, column] = value
     
     def get_portfolio_info(self) -> dict:
-        pi = {label: asset.qty for label, asset in self.productive_assets.items()}
+        pi = dict(self.holdings)
         pi["money"] = self.money
         return pi
     
-    def buy_asset(self, asset_name: str, qty: int):
-        """Purchase a number of assets at the current market price"""
+    def buy_asset(self, asset_name: str, qty: int, price: float = None):
+        """Purchase a number of assets at the current market price (or at price), returns the price paid"""
         if qty == 0:
-            return
-        asset = self.productive_assets[asset_name]
-        price = asset.get_price()
+            return price
+        if price is None:
+            price = self.market.get_price(asset_name)
         if self.money < price * qty:
             raise InsufficientResources(f"Not enough money to purchase {qty}x {asset_name}")
         self.money -= (price * qty)
-        self.productive_assets[asset_name].qty += qty
+        self.set_qty(asset_name, self.get_qty(asset_name) + qty)
+        return price
     
-    def sell_asset(self, asset_name: str, qty: int):
-        """Sell a number of assets at the current market price"""
+    def sell_asset(self, asset_name: str, qty: int, price: float = None):
+        """Sell a number of assets at the current market price (or at price), returns the price received"""
         if qty == 0:
-            return
-        asset = self.productive_assets[asset_name]
-        if qty > asset.qty:
+            return price
+        if qty > self.get_qty(asset_name):
             raise InsufficientResources(f"Not enough {asset_name} to sell {qty}")
-        self.money += (asset.get_price() * qty)
-        self.productive_assets[asset_name].qty -= qty
-
-        
-
+        if price is None:
+            price = self.market.get_price(asset_name)
+        self.money += (price * qty)
+        self.set_qty(asset_name, self.get_qty(asset_name) - qty)
+        return price
 
 
 class ProductiveAsset(GARCH):
     """Productive assets are assets used in the production of other assets, or produced themselves
     
-    They inheret from GARCH to simulate a market you can buy/sell them on"""
+    They inheret from GARCH to simulate a market you can buy/sell them on.
+    A single instance per symbol lives in the Market; quantities owned live in AssetPortfolio"""
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.recipe: list = []
-        self._qty: int = 0
-    
-    @property
-    def qty(self):
-        return self._qty
-    
-    @qty.setter
-    def qty(self, value):
-        if (value) < 0:
-            raise InsufficientResources("Can not reduce asset quantity below zero")
-        self._qty = value
     
     def par_value_set_trigger(self, period):
         # is called every 1000 intervals
@@ -87,22 +105,46 @@ class Recipe:
         self.ingredients = ingredients
         self.time = time
 
+@dataclass()
+class ProductionJob:
+    """qty units of product made `lines` at a time, unit_time periods each, starting after start_period"""
+    product: str
+    qty: int
+    start_period: int
+    unit_time: int
+    delivered: int = 0
+    lines: int = 1
+
+    @property
+    def eta(self) -> int:
+        """Period the last unit is finished"""
+        return self.start_period + -(-self.qty // self.lines) * max(self.unit_time, 0)
+
+    def completed_by(self, period: int) -> int:
+        """Number of units finished by period"""
+        if self.unit_time <= 0:
+            return self.qty if period >= self.start_period else 0
+        return min(self.qty, max(0, (period - self.start_period) // self.unit_time) * self.lines)
+
+    def get_job_info(self) -> dict:
+        return {"product": self.product, "qty": self.qty - self.delivered, "eta": self.eta}
+
 class RawResource(ProductiveAsset):
     """Raw resources are consumed to produce other products"""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
 class Obtainium(RawResource):
-    def __init__(self):
-        super().__init__(init_value = 100, b = 0.25, c = 0.2)
+    def __init__(self, seed=None):
+        super().__init__(init_value = 100, b = 0.25, c = 0.2, seed = seed)
 
 class Eludium(RawResource):
-    def __init__(self):
-        super().__init__(init_value = 500, b = 0.35, c = 0.25)
+    def __init__(self, seed=None):
+        super().__init__(init_value = 500, b = 0.35, c = 0.25, seed = seed)
 
 class Unobtainium(RawResource):
-    def __init__(self):
-        super().__init__(init_value = 20000, b = 0.4, c = 0.4)
+    def __init__(self, seed=None):
+        super().__init__(init_value = 20000, b = 0.4, c = 0.4, seed = seed)
 
 
 class IntermediateProduct(ProductiveAsset):
@@ -111,14 +153,14 @@ class IntermediateProduct(ProductiveAsset):
         super().__init__(*args, **kwargs)
 
 class Widget(IntermediateProduct):
-    def __init__(self):
-        super().__init__(init_value = 1000, b = 0.25, c = 0.2)
+    def __init__(self, seed=None):
+        super().__init__(init_value = 1000, b = 0.25, c = 0.2, seed = seed)
         # base cost = 200 + 500 = 700
         self.recipe = Recipe("widget", [AssetQty("obtainium", 2), AssetQty("eludium", 1)], 5)
 
 class Gizmo(IntermediateProduct):
-    def __init__(self):
-        super().__init__(init_value = 3500, b = 0.35, c = 0.25)
+    def __init__(self, seed=None):
+        super().__init__(init_value = 3500, b = 0.35, c = 0.25, seed = seed)
         # base cost = 1100 + 1500 = 2600
         self.recipe = Recipe("gizmo", [AssetQty("obtainium", 11), AssetQty("eludium", 3)], 15)
 
@@ -129,14 +171,14 @@ class FinalGood(ProductiveAsset):
         super().__init__(*args, **kwargs)
 
 class Doohickey(FinalGood):
-    def __init__(self):
-        super().__init__(init_value = 10000, b = 0.25, c = 0.2)
+    def __init__(self, seed=None):
+        super().__init__(init_value = 10000, b = 0.25, c = 0.2, seed = seed)
         # base cost = 2000 + 2000 + 3500 = 7500
         self.recipe = Recipe("doohickey", [AssetQty("obtainium", 20), AssetQty("eludium", 4), AssetQty("widget", 1)], 60)
 
 class Gadget(FinalGood):
-    def __init__(self):
-        super().__init__(init_value = 50000, b = 0.35, c = 0.25)
+    def __init__(self, seed=None):
+        super().__init__(init_value = 50000, b = 0.35, c = 0.25, seed = seed)
         # base cost = 5500 + 20000 + 6000 + 7000 = 38500
         self.recipe = Recipe("gadget", [AssetQty("eludium", 11), AssetQty("unobtainium", 1), AssetQty("widget", 6), AssetQty("gizmo", 2)], 300)
 
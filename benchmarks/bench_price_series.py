@@ -0,0 +1,56 @@
+"""Tick cost of growing a price series one period at a time
+
+Run from the repository root:
+    python -m benchmarks.bench_price_series [--max-periods 4000000]
+
+Prints the mean cost of a single-period append at increasing history lengths. With amortized growth the
+cost stays flat; the np.concatenate column shows what every tick used to pay.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from price_series import PriceSeries
+
+
+def time_appends(series: PriceSeries, ticks: int) -> float:
+    """Mean seconds per single-period append"""
+    start = time.perf_counter()
+    for _ in range(ticks):
+        cols = series.extend(1)
+        i = len(series) - 1
+        for column in cols.values():
+            column[i] = 1.0
+    return (time.perf_counter() - start) / ticks
+
+
+def time_concatenate(length: int, ticks: int) -> float:
+    """Mean seconds per single-period append when every column is re-concatenated"""
+    columns = [np.ones(length) for _ in PriceSeries.COLUMNS]
+    start = time.perf_counter()
+    for _ in range(ticks):
+        columns = [np.concatenate((column, np.ones(1))) for column in columns]
+    return (time.perf_counter() - start) / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-periods", type=int, default=4_000_000)
+    parser.add_argument("--ticks", type=int, default=10_000, help="appends timed at each checkpoint")
+    args = parser.parse_args()
+
+    print(f"{'periods':>10} {'series us/tick':>15} {'concat us/tick':>15}")
+    checkpoint = 1000
+    while checkpoint <= args.max_periods:
+        # a fresh series each time, the last checkpoint's appends may have taken the old one past this one
+        series = PriceSeries()
+        series.extend(checkpoint)
+        per_tick = time_appends(series, args.ticks)
+        concat = time_concatenate(checkpoint, max(1, args.ticks // 100))
+        print(f"{checkpoint:>10} {per_tick * 1e6:>15.3f} {concat * 1e6:>15.3f}")
+        checkpoint *= 4
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Cold start cost of a fresh app worker
+
+Run from the repository root:
+    python -m benchmarks.startup [--runs 5] [--top 15]
+
+Each run starts a new interpreter, imports app and serves one request through the Flask test client.
+Prints the median time to the first response (from process start, and from the first line of our code),
+then the modules with the highest cumulative import cost from `python -X importtime`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# run in the child process, prints seconds from its first line to the first response
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+import app
+client = app.app.test_client()
+client.post("/login", data={"username": "benchmark"})
+response = client.get("/info/market")
+assert response.status_code == 200, response.status_code
+print(time.perf_counter() - start)
+"""
+
+
+def time_first_request(env: dict) -> tuple[float, float]:
+    """(seconds from process start, seconds from the first line of the script) to the first response"""
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", FIRST_REQUEST], env=env, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - start
+    return total, float(out.stdout.strip().splitlines()[-1])
+
+
+def import_costs(env: dict) -> list[tuple[str, int, int]]:
+    """(module, self microseconds, cumulative microseconds) for every module app imports"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], env=env,
+                         capture_output=True, text=True, check=True)
+    costs = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # the header line
+        costs.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of modules to list by import cost")
+    args = parser.parse_args()
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), LOGURU_LEVEL="WARNING")
+
+    runs = [time_first_request(env) for _ in range(args.runs)]
+    print(f"time to first request, median of {args.runs} runs")
+    print(f"  from process start  {statistics.median(total for total, _ in runs) * 1000:8.1f} ms")
+    print(f"  from import app     {statistics.median(script for _, script in runs) * 1000:8.1f} ms")
+
+    costs = import_costs(env)
+    print(f"\n{'module':40} {'self ms':>9} {'cumulative ms':>14}")
+    for module, own, cumulative in sorted(costs, key=lambda cost: cost[2], reverse=True)[:args.top]:
+        print(f"{module:40} {own / 1000:9.1f} {cumulative / 1000:14.1f}")
+    heavy = [name for name in ("plotly", "pandas", "tqdm", "yfinance") if any(m == name for m, _, _ in costs)]
+    if heavy:
+        print(f"\nwarning: {', '.join(heavy)} imported at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Benchmarks for the simulation and request hot paths, with machine-readable results
+
+Run from the repository root:
+    python -m benchmarks.suite [--quick] [--filter routes] [--output results.json]
+    python -m benchmarks.suite --compare baseline.json [--threshold 1.25]
+
+Every benchmark uses fixed seeds, so two runs do the same work and results can be diffed between
+versions. Results are written as json (to stdout by default). With --compare, each result is also
+checked against a previous run and the exit status is 1 if any got slower than threshold times.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+from loguru import logger
+
+SEED = 1234
+
+
+def measure(setup, repeat: int) -> list[float]:
+    """Seconds per operation for each of repeat runs. setup() returns (run, number): a fresh callable to time
+    and the number of operations it does, so state mutated by a run never leaks into the next one."""
+    times = []
+    for _ in range(repeat):
+        run, number = setup()
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) / number)
+    return times
+
+
+def bench_sim_to_period(quick: bool):
+    """Simulating a fresh price series out to each horizon"""
+    import assets
+    for horizon in ([1_000, 10_000, 100_000] if quick else [1_000, 10_000, 100_000, 1_000_000]):
+        def setup(horizon=horizon):
+            asset = assets.Widget(seed=SEED)
+            return (lambda: asset._sim_to_period(horizon)), 1
+        yield "garch.sim_to_period", {"periods": horizon}, setup
+
+
+def bench_monte_carlo(quick: bool):
+    import assets
+    it, n = (200, 3600) if quick else (1000, 3600)
+    def setup():
+        asset = assets.Widget(seed=SEED)
+        return (lambda: asset.monte_carlo(it=it, n=n, seed=SEED)), 1
+    yield "garch.monte_carlo", {"it": it, "n": n, "workers": 1}, setup
+
+
+def stocked_game(investors: int):
+    """Seeded game where every investor holds enough to mass produce widgets for a long time"""
+    from game import Game
+    game = Game(seed=SEED)
+    for i in range(investors):
+        investor = game.get_investor(f"investor{i}")
+        investor.portfolio.holdings.update(obtainium=10**6, eludium=10**6)
+        investor.production["widget"] = 1
+    return game
+
+
+def bench_increment_time(quick: bool):
+    """Advancing the clock, then settling every investor as their next requests would"""
+    for investors in [10, 1_000, 10_000]:
+        game = stocked_game(investors)
+        usernames = list(game.get_investors())
+        def advance(game=game):
+            return (lambda: game.increment_time(10)), 1
+        def advance_and_settle(game=game, usernames=usernames):
+            def run():
+                game.increment_time(10)
+                for username in usernames:
+                    game.get_investor(username)
+            return run, 1
+        def advance_and_settle_all(game=game):
+            def run():
+                game.increment_time(10)
+                game.settle_all()
+            return run, 1
+        yield "game.increment_time", {"investors": investors, "periods": 10}, advance
+        yield "game.increment_time+settle", {"investors": investors, "periods": 10}, advance_and_settle
+        yield "game.increment_time+settle_all", {"investors": investors, "periods": 10}, advance_and_settle_all
+
+
+def bench_production(quick: bool):
+    loops = 1_000 if quick else 10_000
+    def mass_produce():
+        investor = stocked_game(1).get_investor("investor0")
+        investor.production.update(widget=1, gizmo=1)
+        return (lambda: [investor.mass_produce() for _ in range(loops)]), loops
+    def mass_produce_bulk():
+        investor = stocked_game(1).get_investor("investor0")
+        investor.production.update(widget=1, gizmo=1)
+        return (lambda: investor.mass_produce(runs=loops)), 1
+    def queue():
+        investor = stocked_game(1).get_investor("investor0")
+        investor.production["widget"] = 0
+        def run():
+            # alternate products so every order is its own job
+            for i in range(loops):
+                investor.produce_asset("widget" if i % 2 else "gizmo", 1)
+            for period in range(0, loops * 15, 15):
+                investor.advance_prod_queue(period)
+        return run, loops
+    def factory_queue():
+        investor = stocked_game(1).get_investor("investor0")
+        investor.production["widget"] = 0
+        investor.portfolio.money = 1e9
+        investor.build_factory("refinery", 4)
+        investor.build_factory("processor", 4)
+        investor.portfolio.holdings["widget"] = 10**6
+        def run():
+            for i in range(loops):
+                investor.produce_asset("widget" if i % 2 else "doohickey", 1)
+            for period in range(0, loops * 15, 15):
+                investor.advance_prod_queue(period)
+        return run, loops
+    yield "investor.mass_produce", {"runs": 1}, mass_produce
+    yield "investor.mass_produce", {"runs": loops}, mass_produce_bulk
+    yield "investor.prod_queue", {"jobs": loops}, queue
+    yield "investor.prod_queue", {"jobs": loops, "factories": 2}, factory_queue
+
+
+def bench_routes(quick: bool):
+    """Requests through the Flask test client against a seeded game with a stopped clock"""
+    os.environ.setdefault("WIDGET_SEED", str(SEED))
+    os.environ.setdefault("WIDGET_PERIOD_SECONDS", "1e9")
+    # the in-memory game, a shared store has no clock here and would need a clock.py process
+    os.environ.pop("WIDGET_STORE", None)
+    import app
+    if app.clock is not None:
+        app.clock.stop()
+    requests = 200 if quick else 2_000
+    client = app.app.test_client()
+    client.post("/login", data={"username": "benchmark"})
+    with app.game.investor("benchmark") as investor:
+        investor.portfolio.money = 1e12
+    orders = [{"action": "buy", "symbol": "obtainium", "qty": 2}, {"action": "sell", "symbol": "obtainium", "qty": 2}]
+    routes = [
+        ("GET", "/asset/widget"),
+        ("GET", "/info/market"),
+        ("GET", "/info/portfolio"),
+        ("GET", "/leaderboard"),
+        ("GET", "/asset/obtainium/buy?qty=1"),
+        ("POST", "/orders"),
+        ("GET", "/asset/widget/chart?points=500"),
+    ]
+    for method, path in routes:
+        def setup(method=method, path=path):
+            app.render_chart.cache_clear()
+            def run():
+                for _ in range(requests):
+                    if method == "POST":
+                        response = client.post(path, json=orders)
+                    else:
+                        response = client.get(path)
+                    assert response.status_code < 400, (path, response.status_code)
+            return run, requests
+        yield "route", {"method": method, "path": path}, setup
+
+
+SUITES = {
+    "sim": bench_sim_to_period,
+    "monte_carlo": bench_monte_carlo,
+    "increment_time": bench_increment_time,
+    "production": bench_production,
+    "routes": bench_routes,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def result_key(result: dict) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> bool:
+    """Print each result's ratio to the baseline's median, returns False if any regressed past threshold"""
+    previous = {result_key(result): result for result in baseline["results"]}
+    ok = True
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        ratio = result["median"] / old["median"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        ok &= ratio <= threshold
+        print(f"{ratio:6.2f}x  {result['name']} {json.dumps(result['params'])} {flag}", file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast sanity check")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", choices=SUITES, action="append", help="only run these suites")
+    parser.add_argument("--output", help="write results here instead of stdout")
+    parser.add_argument("--compare", help="results of a previous run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = []
+    for suite in args.filter or SUITES:
+        for name, params, setup in SUITES[suite](args.quick):
+            times = measure(setup, args.repeat)
+            results.append({
+                "name": name,
+                "params": params,
+                "repeat": args.repeat,
+                "min": min(times),
+                "median": statistics.median(times),
+                "mean": statistics.fmean(times),
+            })
+            print(f"{results[-1]['median'] * 1e6:12.1f} us  {name} {json.dumps(params)}", file=sys.stderr)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "quick": args.quick,
+            "seed": SEED,
+            "unit": "seconds per operation",
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
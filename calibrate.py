@@ -0,0 +1,147 @@
+"""Monte Carlo sweep of GARCH parameters, for picking the ones an asset should get
+
+Run from the repository root:
+    python calibrate.py --b 0.15 0.25 0.35 --c 0.2 0.25 --threshold 0.05 0.1 --it 1000 --n 9000 --output sweep.csv
+
+Every combination of --b, --c, --a and --threshold (the bias threshold) is simulated with the same seed, so
+differences between grid points come from the parameters rather than the draws. Chunks of paths from every
+grid point share one pool of worker processes. Finished grid points are appended to --cache as soon as they're
+done, so a re-run (or a run with a bigger grid) only simulates the points it hasn't seen.
+
+Of the bias settings only the threshold is swept. The bias ratio (drawn between 1/4000 and 1/3000 per period)
+and the jump multipliers are fixed in the simulation kernel, so every grid point shares them.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+from loguru import logger
+
+from GARCH import MC_CHUNK_PATHS, GARCH, _monte_carlo_chunk
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+CRASH_DRAWDOWN = 0.5  # a path crashed if it ever fell this far below a previous high
+COLUMNS = (
+    ["b", "c", "a", "threshold", "it", "n", "seed"]
+    + [f"return_q{round(q * 100):02d}" for q in QUANTILES]
+    + ["return_mean", "volatility", "bias", "crash_frequency"]
+)
+
+
+def point_key(point: dict) -> str:
+    return json.dumps(point, sort_keys=True)
+
+
+def read_cache(path: str) -> dict[str, dict]:
+    """Results by point_key of every grid point in the cache, torn lines (from a killed run) are skipped"""
+    cached = {}
+    if not os.path.exists(path):
+        return cached
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            cached[point_key(entry["point"])] = entry["result"]
+    return cached
+
+
+def summarize(chunks: list[tuple], crash: float) -> dict:
+    """Return quantiles (in %), mean realized volatility per period, total bias and crash frequency of a grid
+    point's chunks"""
+    returns = np.concatenate([cr for cr, _, _ in chunks]) * 100
+    volatility = np.concatenate([stats["volatility"] for _, _, stats in chunks])
+    drawdown = np.concatenate([stats["max_drawdown"] for _, _, stats in chunks])
+    quantiles = np.quantile(returns, QUANTILES).tolist()
+    result = {f"return_q{round(q * 100):02d}": value for q, value in zip(QUANTILES, quantiles)}
+    result["return_mean"] = float(returns.mean())
+    result["volatility"] = float(volatility.mean())
+    result["bias"] = float(sum(bias for _, bias, _ in chunks))
+    result["crash_frequency"] = float((drawdown >= crash).mean())
+    return result
+
+
+def sweep(grid: list[dict], it: int, n: int, seed: int, workers: int, cache: str = None,
+          chunk_size: int = MC_CHUNK_PATHS, crash: float = CRASH_DRAWDOWN) -> list[dict]:
+    """A row per grid point of {b, c, a, threshold}, from the cache where it's already been simulated"""
+    points = [{**params, "it": it, "n": n, "seed": seed, "chunk_size": chunk_size, "crash": crash}
+              for params in grid]
+    cached = read_cache(cache) if cache else {}
+    todo = [point for point in points if point_key(point) not in cached]
+    logger.info(f"{len(points) - len(todo)} of {len(points)} grid points cached, simulating {len(todo)}")
+    jobs = []
+    for point in todo:
+        asset = GARCH(100, b=point["b"], c=point["c"])
+        asset.a = point["a"]
+        asset.bias_threshold = point["threshold"]
+        jobs.extend(asset.monte_carlo_jobs(it, n, np.random.SeedSequence(seed), chunk_size, path_stats=True))
+    per_point = -(-it // chunk_size)
+    if jobs:
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)))
+            chunks = pool.map(_monte_carlo_chunk, jobs)
+        else:
+            pool = None
+            chunks = map(_monte_carlo_chunk, jobs)
+        try:
+            # chunks come back in order, per_point of them for each point
+            done = []
+            for i, chunk in enumerate(chunks):
+                done.append(chunk)
+                if len(done) < per_point:
+                    continue
+                point = todo[i // per_point]
+                cached[point_key(point)] = result = summarize(done, crash)
+                done = []
+                logger.info(f"b={point['b']} c={point['c']} a={point['a']} threshold={point['threshold']}: "
+                            f"median return {result['return_q50']:.2f}%, volatility {result['volatility']:.5f}, "
+                            f"crash frequency {result['crash_frequency']:.3f}")
+                if cache:
+                    with open(cache, "a") as f:
+                        f.write(json.dumps({"point": point, "result": result}) + "\n")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+    return [{**point, **cached[point_key(point)]} for point in points]
+
+
+def main():
+    defaults = GARCH()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--b", type=float, nargs="+", default=[0.25], help="ARCH coefficients")
+    parser.add_argument("--c", type=float, nargs="+", default=[0.2], help="GARCH coefficients")
+    parser.add_argument("--a", type=float, nargs="+", default=[defaults.a], help="variance constants")
+    parser.add_argument("--threshold", type=float, nargs="+", default=[defaults.bias_threshold],
+                        help="price difference from par before bias begins")
+    parser.add_argument("--it", type=int, default=1000, help="paths per grid point")
+    parser.add_argument("--n", type=int, default=9000, help="periods per path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--crash", type=float, default=CRASH_DRAWDOWN, help="drawdown that counts as a crash")
+    parser.add_argument("--cache", default="calibrate-cache.jsonl", help="completed grid points, '' for none")
+    parser.add_argument("--output", help="write the csv here instead of stdout")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    grid = [{"b": b, "c": c, "a": a, "threshold": threshold}
+            for b, c, a, threshold in itertools.product(args.b, args.c, args.a, args.threshold)]
+    rows = sweep(grid, args.it, args.n, args.seed, args.workers, args.cache, crash=args.crash)
+    f = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(f, COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if args.output:
+            f.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import threading
+import time
+from loguru import logger
+
+
+class GameClock:
+    """Advances a Game in a background thread, one period every period_seconds of wall-clock time
+
+    If a tick runs late (a slow tick, a paused process) every period that is due is advanced in a single
+    Game.increment_time call instead of one call per period.
+    Listeners are called with the game after every tick that advanced it.
+    """
+    def __init__(self, game, period_seconds: float = 1.0, listeners: list = None):
+        self.game = game
+        self.period_seconds = period_seconds
+        self.listeners = list(listeners or [])
+        self.tick_duration = 0.0  # seconds the last tick took
+        self.tick_periods = 0  # periods advanced by the last tick
+        self._start_time = None
+        self._start_period = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def due_periods(self) -> int:
+        """Number of periods the game is behind the wall clock"""
+        if self._start_time is None:
+            return 0
+        target = self._start_period + int((time.monotonic() - self._start_time) / self.period_seconds)
+        return max(target - self.game.current_period, 0)
+
+    @property
+    def lag(self) -> float:
+        """Seconds the game is behind the wall clock"""
+        return self.due_periods() * self.period_seconds
+
+    def tick(self) -> int:
+        """Advance every due period at once, returns the number of periods advanced"""
+        due = self.due_periods()
+        if not due:
+            return 0
+        if due > 1:
+            logger.debug(f"Clock is {due} periods behind, catching up")
+        start = time.perf_counter()
+        self.game.increment_time(due)
+        self.tick_duration = time.perf_counter() - start
+        self.tick_periods = due
+        for listener in self.listeners:
+            try:
+                listener(self.game)
+            except Exception:
+                logger.exception(f"Clock listener {listener} failed")
+        return due
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Clock tick failed")
+            # sleep until the next period boundary
+            elapsed = time.monotonic() - self._start_time
+            self._stop.wait(self.period_seconds - elapsed % self.period_seconds)
+
+    def start(self):
+        if self.running:
+            return
+        self._start_time = time.monotonic()
+        self._start_period = self.game.current_period
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="game-clock", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_clock_info(self) -> dict:
+        return {
+            "period": self.game.current_period,
+            "period_seconds": self.period_seconds,
+            "running": self.running,
+            "tick_duration": self.tick_duration,
+            "tick_periods": self.tick_periods,
+            "lag": self.lag,
+        }
+
+
+if __name__ == "__main__":
+    # the one process that advances a game shared through a store, run next to any number of app workers
+    from game import Game
+    from store import SQLiteStore
+    parser = argparse.ArgumentParser(description="Advance a shared game's markets")
+    parser.add_argument("store", help="path of the SQLite database the app workers use (WIDGET_STORE)")
+    parser.add_argument("--period-seconds", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, help="seed for reproducible prices, a restart reuses the stored one")
+    args = parser.parse_args()
+    store = SQLiteStore(args.store)
+    # picks up from the store's seed and period if a clock has run against it before
+    game = Game(store=store, writer=True, seed=args.seed)
+    clock = GameClock(game, period_seconds=args.period_seconds)
+    clock.start()
+    logger.info(f"Clock running from period {game.current_period}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        clock.stop()
@@ -1,15 +1,89 @@
+from collections import deque
+from dataclasses import asdict
+import assets as a
+
+
+def queue_job(jobs: deque, recipe, qty: int, period: int, lines: int = 1):
+    """Queue qty units of recipe on jobs, after whatever is already queued and no earlier than period"""
+    start = period
+    if jobs:
+        last = jobs[-1]
+        start = max(start, last.eta)
+        if last.product == recipe.product and last.lines == lines and last.eta == start:
+            # straight after a job for the same product, make it one bigger batch
+            last.qty += qty
+            return
+    jobs.append(a.ProductionJob(recipe.product, qty, start, recipe.time, lines=lines))
+
+
+def advance_jobs(jobs: deque, period: int, portfolio):
+    """Deliver every unit of jobs finished by period to portfolio, popping the jobs that are done"""
+    while jobs:
+        job = jobs[0]
+        done = job.completed_by(period)
+        if done > job.delivered:
+            portfolio.set_qty(job.product, portfolio.get_qty(job.product) + done - job.delivered)
+            job.delivered = done
+        if done < job.qty:
+            return
+        jobs.popleft()
+
+
+def finish_time(jobs: deque, recipe, qty: int, period: int, lines: int = 1) -> int:
+    """Period qty units of recipe queued on jobs now would be done by"""
+    start = max(period, jobs[-1].eta) if jobs else period
+    return start + -(-qty // lines) * max(recipe.time, 0)
+
+
 class Factory:
-    def __init__(self):
-        pass
+    """Parallel production lines working through a queue of ProductionJobs, one job at a time with every
+    line on it. Only makes products of the asset class it accepts."""
+    accepts = a.ProductiveAsset
+    line_cost = 0  # money per line to build one
+
+    def __init__(self, lines: int = 1):
+        if not isinstance(lines, int) or isinstance(lines, bool) or lines < 1:
+            raise ValueError("A factory needs a positive integer number of lines")
+        self.lines = lines
+        self.jobs = deque()
+
+    @property
+    def kind(self) -> str:
+        return type(self).__name__.lower()
+
+    def can_make(self, asset) -> bool:
+        return isinstance(asset, self.accepts)
+
+    def queue(self, recipe, qty: int, period: int):
+        queue_job(self.jobs, recipe, qty, period, self.lines)
+
+    def finish_time(self, recipe, qty: int, period: int) -> int:
+        return finish_time(self.jobs, recipe, qty, period, self.lines)
+
+    def advance(self, period: int, portfolio):
+        advance_jobs(self.jobs, period, portfolio)
+
+    def get_factory_info(self) -> dict:
+        return {"kind": self.kind, "lines": self.lines, "queue": [job.get_job_info() for job in self.jobs]}
+
+    def get_state(self) -> dict:
+        return {"kind": self.kind, "lines": self.lines, "jobs": [asdict(job) for job in self.jobs]}
+
+    @staticmethod
+    def from_state(state: dict) -> "Factory":
+        factory = FACTORY_TYPES[state["kind"]](state["lines"])
+        factory.jobs.extend(a.ProductionJob(**job) for job in state["jobs"])
+        return factory
 
 class Refinery(Factory):
-    def __init__(self):
-        """ Refineries refine Raw Resources into Intermediate Products. """
-        super().__init__()
+    """ Refineries refine Raw Resources into Intermediate Products. """
+    accepts = a.IntermediateProduct
+    line_cost = 5_000
 
 class Processor(Factory):
-    def __init__(self):
-        """ Processor processes Intermediate Products into Final Goods. """
-        super().__init__() 
-
+    """ Processor processes Intermediate Products into Final Goods. """
+    accepts = a.FinalGood
+    line_cost = 25_000
 
+# the factories investors can build, by kind
+FACTORY_TYPES = {"refinery": Refinery, "processor": Processor}
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+
+from loguru import logger
+
+from assets import MarketNotStarted
+
+KEEPALIVE_SECONDS = 15.0  # idle subscribers get a comment this often, so dropped connections are noticed
+
+
+class PriceBroadcaster:
+    """Fans one message per tick out to any number of streaming subscribers
+
+    The clock calls it (as a GameClock listener) after every tick. The message holding every symbol's price
+    is serialized once, subscribers just wait for the next one and write out the same bytes.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._message = None
+        self._period = None
+        self.subscribers = 0
+
+    def __call__(self, game):
+        self.publish(game.market.snapshot)
+
+    def publish(self, snapshot):
+        """Serialize a MarketSnapshot as a server-sent event and wake every subscriber"""
+        data = json.dumps({"period": snapshot.period, "prices": dict(snapshot.prices)}, separators=(",", ":"))
+        message = f"id: {snapshot.period}\nevent: prices\ndata: {data}\n\n".encode()
+        with self._cond:
+            self._message = message
+            self._period = snapshot.period
+            self._cond.notify_all()
+
+    def subscribe(self, keepalive: float = KEEPALIVE_SECONDS):
+        """Generator of server-sent events, the latest one straight away then one per published period.
+        Periods published while a subscriber is still writing the previous one are skipped, only the latest
+        prices matter."""
+        seen = None
+        with self._cond:
+            self.subscribers += 1
+        try:
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self._period != seen, timeout=keepalive):
+                        message = b": keepalive\n\n"
+                    else:
+                        message, seen = self._message, self._period
+                yield message
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def follow(self, market, interval: float = 1.0) -> threading.Thread:
+        """Publish from a market some other process advances (a SharedMarket reader), checking every
+        interval seconds. One thread per process, however many subscribers there are."""
+        def run():
+            period = None
+            while True:
+                try:
+                    market.refresh()
+                    snapshot = market.snapshot
+                    if snapshot.period != period:
+                        self.publish(snapshot)
+                        period = snapshot.period
+                except MarketNotStarted:
+                    pass
+                except Exception:
+                    logger.exception("Price feed failed to read the market")
+                time.sleep(interval)
+        thread = threading.Thread(target=run, name="price-feed", daemon=True)
+        thread.start()
+        return thread
@@ -1,28 +1,233 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+import numpy as np
+import assets as a
+from holdings import HoldingsTable, mass_produce_rows
 from investor import Investor
+from market import Market
+from metrics import PERIODS_SIMULATED, PHASE_SECONDS, SIMULATION_RATE
+from orders import OrderBook
 
 class Game:
-    def __init__(self):
-        self.current_period = 0
+    """Concurrency model: the clock is the only writer of market prices, which are published as immutable
+    snapshots that request threads read without locking. Each investor has its own lock, held by whoever
+    settles or changes them, so requests for different investors never wait on each other.
+
+    With a store (see store.py) investors live in a database shared by every worker process instead, and
+    prices come from the one clock process created with writer=True."""
+    def __init__(self, store=None, writer: bool = False, seed=None):
+        self.store = store
+        if store is None:
+            self.market = Market(seed=seed)
+        else:
+            from store import SharedMarket
+            self.market = SharedMarket(store, writer=writer, seed=seed)
         self._investors = {}
+        self._investors_lock = threading.Lock()  # only held while adding an investor
+        # every in-memory investor's cash, holdings and production targets, one row each
+        self.holdings = HoldingsTable(self.market.symbols, self.market.products)
+        self.journal = None  # TradeJournal every trade is recorded to, see snapshot.py
+        self.orders = OrderBook()  # resting limit and stop orders, filled as the clock advances
+        self.leaderboard = None  # Leaderboard re-valuing investors as they trade, see leaderboard.py
         # self.investor = Investor()
+
+    @property
+    def current_period(self) -> int:
+        return self.market.current_period
     
+    def get_investors(self) -> dict:
+        """Copy of the in-memory investors by username"""
+        return dict(self._investors)
+
+    def investor_count(self) -> int:
+        if self.store is not None:
+            return self.store.count_investors()
+        return len(self._investors)
+
+    def add_investor(self, username: str, state: dict = None, period: int = None):
+        """Get an investor without settling them, creating them if needed (from a get_state dict if given)"""
+        investor = self._investors.get(username)
+        if investor is None:
+            with self._investors_lock:
+                investor = self._investors.get(username)
+                if investor is None:
+                    investor = Investor(self.market, period=self.current_period if period is None else period,
+                                        row=self.holdings.add_row(), username=username)
+                    if state is not None:
+                        investor.set_state(state)
+                    self._investors[username] = investor
+        return investor
+
     def get_investor(self, username: str):
-        try:
-            return self._investors[username]
-        except KeyError:
-            self._investors[username] = Investor()
-            return self._investors[username]
+        """Get an investor, settled up to the current period
+        Hold investor.lock while changing it"""
+        investor = self.add_investor(username)
+        with investor.lock:
+            investor.settle(self.current_period)
+        return investor
+    
+    @contextmanager
+    def investor(self, username: str, read_only: bool = False):
+        """Investor settled up to the current period, held exclusively until the block exits
+        With a store it's loaded and saved in one database transaction. With read_only it's loaded in a read
+        transaction that doesn't wait for the write lock and nothing is saved, settling is redone next write."""
+        if self.store is None:
+            investor = self.get_investor(username)
+            with investor.lock:
+                yield investor
+            return
+        transaction = self.store.read_transaction if read_only else self.store.transaction
+        with transaction() as conn:
+            state = self.store.load_investor(conn, username)
+            investor = Investor(self.market, period=self.current_period, username=username)
+            if state is not None:
+                investor.set_state(state)
+            investor.settle(self.current_period)
+            yield investor
+            if not read_only:
+                self.store.save_investor(conn, username, investor.get_state())
     
+    def settle_all(self) -> int:
+        """Settle every in-memory investor up to the current period at once, returns the number settled
+
+        Investors with at most one production target, made from raw resources only and without factories, are
+        settled as array operations over the whole holdings table: every run of their window can be batched.
+        Only those with something to deliver are then visited one by one. Everyone else goes through settle.
+        """
+        period = self.current_period
+        investors = list(self._investors.values())
+        # products whose recipes use other products, deliveries can change what they can make mid-window
+        made_inputs = np.array([bool(inputs) for inputs in self.market.input_products])
+        with ExitStack() as stack:
+            # investors are only ever locked one at a time elsewhere, so taking them all can't deadlock
+            for investor in investors:
+                stack.enter_context(investor.lock)
+            start = time.perf_counter()
+            locked = {id(investor) for investor in investors}
+            batched, rest = [], []
+            for block in self.holdings.blocks:
+                n = block.used
+                owners = block.owners[:n]
+                # rows of investors added since the list was taken aren't locked, leave them be
+                mine = np.fromiter((id(owner) in locked for owner in owners), dtype=bool, count=n)
+                plain = np.fromiter((owner is not None and not owner.factories for owner in owners), dtype=bool,
+                                    count=n)
+                production = block.production[:n]
+                batchable = (mine & plain & ((production > 0).sum(axis=1) <= 1)
+                             & ~(production[:, made_inputs] > 0).any(axis=1))
+                settled = block.settled_period[:n]
+                runs = np.where(batchable, np.maximum(period - settled, 0), 0)
+                made = mass_produce_rows(block.holdings[:n], production, runs, self.market.ingredient_matrix)
+                for index in np.flatnonzero(made.any(axis=1)):
+                    owners[index].queue_runs(made[index])
+                settled[batchable] = np.maximum(settled[batchable], period)
+                batched.extend(owners[index] for index in np.flatnonzero(batchable))
+                rest.extend(owners[index] for index in np.flatnonzero(mine & ~batchable))
+            produced = time.perf_counter()
+            for investor in batched:
+                if investor.prod_queue:
+                    investor.advance_prod_queue(period)
+            PHASE_SECONDS.observe(produced - start, "mass_produce")
+            PHASE_SECONDS.observe(time.perf_counter() - produced, "prod_queue")
+            for investor in rest:
+                investor.settle(period)
+        return len(investors)
+
+    def record(self, username: str, investor, action: str, symbol: str, qty: int, price: float = None, **extra):
+        """Journal a trade just made by investor and re-rank them, call it while still holding investor's lock"""
+        if self.leaderboard is not None:
+            self.leaderboard.update(username, investor)
+        if self.journal is None:
+            return
+        # the period the investor was settled to, which is what the trade saw even if the clock has moved on
+        investor.journal_seq = self.journal.append({
+            "period": investor.settled_period, "username": username, "action": action, "symbol": symbol,
+            "qty": qty, "price": price, **extra,
+        })
+
+    def record_produce(self, username: str, investor, symbol: str, qty: int, bought: dict, **extra):
+        """Journal a production order, after the ingredients produce_asset bought for it"""
+        for name, (short, price) in bought.items():
+            self.record(username, investor, "buy", name, short, price, **extra)
+        self.record(username, investor, "produce", symbol, qty, **extra)
+
+    def place_order(self, username: str, investor, action: str, symbol: str, qty: int, order_type: str,
+                    price: float):
+        """Rest an order in the order book until the price crosses price, see orders.RestingOrder"""
+        if self.store is not None:
+            raise ValueError("Resting orders are not supported with a shared store")
+        if not isinstance(symbol, str) or symbol not in self.market.assets:
+            raise ValueError(f"Asset {symbol} does not exist")
+        if action == "produce" and not self.market.get_recipe(symbol):
+            raise a.NoRecipe(f"No recipe for {symbol}")
+        order = self.orders.place(username, action, symbol, qty, order_type, price, self.current_period)
+        self.record(username, investor, "place", symbol, qty, order.price, order=order.get_order_info())
+        return order
+
+    def cancel_order(self, username: str, investor, order_id: int):
+        order = self.orders.cancel(username, order_id)
+        self.record(username, investor, "cancel", order.symbol, order.qty, order.price, order_id=order_id)
+        return order
+
+    def fill_orders(self) -> int:
+        """Fill every resting order the current prices cross, returns the number crossed"""
+        snapshot = self.market.snapshot
+        crossed = self.orders.crossed(snapshot.prices)
+        for order in crossed:
+            investor = self.get_investor(order.username)
+            price = snapshot.prices[order.symbol]
+            with investor.lock:
+                try:
+                    if order.action == "buy":
+                        investor.portfolio.buy_asset(order.symbol, order.qty, price=price)
+                        self.record(order.username, investor, "buy", order.symbol, order.qty, price, order_id=order.id)
+                    elif order.action == "sell":
+                        investor.portfolio.sell_asset(order.symbol, order.qty, price=price)
+                        self.record(order.username, investor, "sell", order.symbol, order.qty, price, order_id=order.id)
+                    else:
+                        bought = investor.produce_asset(order.symbol, order.qty, autobuy=True)
+                        self.record_produce(order.username, investor, order.symbol, order.qty, bought,
+                                            order_id=order.id)
+                    result = {"status": "filled", "fill_price": price, "fill_period": snapshot.period}
+                except (a.InsufficientResources, a.NoRecipe, KeyError) as exc:
+                    result = {"status": "failed", "reason": str(exc), "fill_period": snapshot.period}
+                    # out of the book all the same
+                    self.record(order.username, investor, "cancel", order.symbol, order.qty, order.price,
+                                order_id=order.id, reason=str(exc))
+            self.orders.finish(order, result)
+        return len(crossed)
+
     def increment_time(self, by = 1):
-        for x in range(by):
-            # much less efficient but allows production (eventually auto sales) each period at accurate prices
-            self.current_period += 1
-            for name, investor in self._investors.items():
-                for name, asset in investor.portfolio.productive_assets.items():
-                    # update all asset prices to current period
-                    asset.get_price(period = self.current_period)
-                investor.mass_produce()
-                investor.increment_prod_queue()
+        """Advance every market and fill the resting orders the new prices cross.
+        Investors catch up lazily the next time they're fetched with get_investor"""
+        # one price series per symbol, shared by every investor, simulated in a single batch
+        start = time.perf_counter()
+        self.market.advance_to(self.current_period + by)
+        elapsed = time.perf_counter() - start
+        PHASE_SECONDS.observe(elapsed, "pricing")
+        PERIODS_SIMULATED.inc(by)
+        if elapsed > 0:
+            SIMULATION_RATE.set(by / elapsed)
+        if len(self.orders):
+            with PHASE_SECONDS.time("orders"):
+                self.fill_orders()
+
+
+class PopulationSettler:
+    """Clock listener that settles every investor with Game.settle_all every `every` periods, so production
+    is made as array operations over the holdings table rather than investor by investor on their next request"""
+    def __init__(self, every: int = 60):
+        self.every = every
+        self._last = None
+
+    def __call__(self, game: Game):
+        period = game.current_period
+        if self._last is None:
+            self._last = period
+        if period - self._last >= self.every:
+            game.settle_all()
+            self._last = period
 
 if __name__ == "__main__":
     print("hello world")
@@ -35,6 +240,7 @@ if __name__ == "__main__":
     investor.produce_asset("widget", 1)
     print(f"Queue: {investor.prod_queue}")
     game.increment_time(5)
+    investor = game.get_investor("test user")  # settles production up to the current period
     print(f"Queue: {investor.prod_queue}")
     investor.portfolio.sell_asset("widget", 10)
     print(f"Money: {investor.portfolio.money}")
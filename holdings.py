@@ -0,0 +1,131 @@
+import threading
+from collections.abc import MutableMapping
+
+import numpy as np
+
+BLOCK_ROWS = 4096  # investors per block of the table
+
+
+class _Block:
+    """Columns for BLOCK_ROWS investors. Never reallocated, so rows can be written while blocks are added."""
+    def __init__(self, rows: int, asset_columns: dict[str, int], product_columns: dict[str, int]):
+        self.asset_columns = asset_columns
+        self.product_columns = product_columns
+        self.money = np.zeros(rows)
+        self.holdings = np.zeros((rows, len(asset_columns)), dtype=np.int64)
+        self.production = np.zeros((rows, len(product_columns)), dtype=np.int64)
+        self.settled_period = np.zeros(rows, dtype=np.int64)
+        self.owners = [None] * rows  # the object viewing each row
+        self.used = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.money.nbytes + self.holdings.nbytes + self.production.nbytes + self.settled_period.nbytes
+
+
+class Row:
+    """One investor's row of a HoldingsTable"""
+    __slots__ = ("block", "index")
+
+    def __init__(self, block: _Block, index: int):
+        self.block = block
+        self.index = index
+
+    def holdings_view(self) -> "RowView":
+        return RowView(self.block.holdings, self.index, self.block.asset_columns)
+
+    def production_view(self) -> "RowView":
+        return RowView(self.block.production, self.index, self.block.product_columns)
+
+
+class RowView(MutableMapping):
+    """dict-like view of one row of a 2-d array, keyed by column name. Values are python ints."""
+    __slots__ = ("_array", "_index", "_columns")
+
+    def __init__(self, array: np.ndarray, index: int, columns: dict[str, int]):
+        self._array = array
+        self._index = index
+        self._columns = columns
+
+    def __getitem__(self, key: str) -> int:
+        return self._array.item(self._index, self._columns[key])
+
+    def __setitem__(self, key: str, value: int):
+        self._array[self._index, self._columns[key]] = value
+
+    def __delitem__(self, key: str):
+        raise TypeError("Columns can not be removed")
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __contains__(self, key) -> bool:
+        return key in self._columns
+
+    def items(self):
+        # one read of the whole row instead of an item per column
+        return zip(self._columns, self._array[self._index].tolist())
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class HoldingsTable:
+    """Cash, holdings, production targets and settled periods of every investor in a game, as numpy arrays
+    indexed by (investor, asset)
+
+    Investors are thin views over their row, so population-wide updates like mass_produce_rows are array
+    operations instead of a Python loop per investor. Rows are allocated in blocks that are never moved, so an
+    investor's row can be changed under that investor's lock while other investors are being added.
+    """
+    def __init__(self, symbols: list[str], products: list[str], block_rows: int = BLOCK_ROWS):
+        self.symbols = list(symbols)
+        self.products = list(products)
+        self.asset_columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.product_columns = {product: i for i, product in enumerate(self.products)}
+        self.block_rows = block_rows
+        self.blocks = []
+        self._lock = threading.Lock()  # only held while adding a row
+
+    def add_row(self) -> Row:
+        with self._lock:
+            if not self.blocks or self.blocks[-1].used == self.block_rows:
+                self.blocks.append(_Block(self.block_rows, self.asset_columns, self.product_columns))
+            block = self.blocks[-1]
+            index = block.used
+            block.used += 1
+        return Row(block, index)
+
+    def __len__(self) -> int:
+        return sum(block.used for block in self.blocks)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(block.nbytes for block in self.blocks)
+
+
+def mass_produce_rows(holdings: np.ndarray, production: np.ndarray, runs: np.ndarray,
+                      ingredient_matrix: np.ndarray) -> np.ndarray:
+    """Spend ingredients for `runs` periods of production targets, for many investors at once
+
+    holdings is (investors, assets) and is updated in place, production is (investors, products) units per
+    period and runs is (investors,). Products are made in order, each as many runs as its ingredients allow.
+    Returns the number of runs made, (investors, products).
+    """
+    made = np.zeros(production.shape, dtype=np.int64)
+    for p, need in enumerate(ingredient_matrix):
+        qty = production[:, p]
+        active = (qty > 0) & (runs > 0)
+        if not active.any():
+            continue
+        feasible = np.where(active, runs, 0)
+        for j in np.flatnonzero(need):
+            per_run = need[j].astype(np.int64) * np.maximum(qty, 1)
+            feasible = np.minimum(feasible, holdings[:, j] // per_run)
+        for j in np.flatnonzero(need):
+            holdings[:, j] -= need[j].astype(np.int64) * qty * feasible
+        made[:, p] = feasible
+    return made
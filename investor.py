@@ -1,82 +1,310 @@
+import math
+import threading
+import time
+from collections import deque
+from copy import deepcopy
+from dataclasses import asdict
+import numpy as np
+from loguru import logger
 import assets as a
+from factories import FACTORY_TYPES, Factory, advance_jobs, finish_time, queue_job
+from holdings import HoldingsTable, Row
+from metrics import PHASE_SECONDS
+
+ORDER_ACTIONS = ("buy", "sell", "produce")
 
 class Investor:
-    def __init__(self):
-        self.portfolio = a.AssetPortfolio()
-        self.production = {name: 0 for name, asset in self.portfolio.productive_assets.items() if asset.recipe}
-        self.prod_queue = []
+    """A view over one row of a HoldingsTable (the game's, or one of its own) plus the production queue"""
+    def __init__(self, market, period: int = 0, row: Row = None, username: str = None):
+        self.market = market
+        self.username = username
+        if row is None:
+            row = HoldingsTable(market.symbols, market.products, block_rows=1).add_row()
+        self.row = row
+        row.block.owners[row.index] = self
+        self.portfolio = a.AssetPortfolio(market, row)
+        # units of each product mass_produce queues per period
+        self.production = row.production_view()
+        # ProductionJobs in the order they'll be worked on, one at a time
+        self.prod_queue = deque()
+        # each with its own queue, production goes wherever it'll be done soonest
+        self.factories = []
+        self.settled_period = period  # production has been applied up to and including this period
+        self.lock = threading.RLock()
+        self.journal_seq = 0  # last TradeJournal entry applied to this investor
+
+    @property
+    def settled_period(self) -> int:
+        return self.row.block.settled_period.item(self.row.index)
+
+    @settled_period.setter
+    def settled_period(self, period: int):
+        self.row.block.settled_period[self.row.index] = period
     
-    def produce_asset(self, asset_name: str, qty: int):
+    def get_state(self) -> dict:
+        """Everything needed to rebuild this investor with set_state, as plain json-able types"""
+        return {
+            "money": self.portfolio.money,
+            "holdings": dict(self.portfolio.holdings),
+            "production": dict(self.production),
+            "prod_queue": [asdict(job) for job in self.prod_queue],
+            "factories": [factory.get_state() for factory in self.factories],
+            "settled_period": self.settled_period,
+            "journal_seq": self.journal_seq,
+        }
+
+    def set_state(self, state: dict):
+        self.portfolio.money = state["money"]
+        self.portfolio.holdings.update(state["holdings"])
+        self.production.update(state["production"])
+        self.prod_queue = deque(a.ProductionJob(**job) for job in state["prod_queue"])
+        self.factories = [Factory.from_state(factory) for factory in state.get("factories", [])]
+        self.settled_period = state["settled_period"]
+        self.journal_seq = state.get("journal_seq", 0)
+
+    def settle(self, period: int):
+        """Catch up on everything that happened between settled_period and period, with the same result as
+        settling one period at a time: each period mass_produce runs once, then finished units are delivered
+
+        The window is taken in chunks that end where a unit that's an ingredient of a production target could
+        be delivered, and each chunk's runs are batched. An investor whose targets only use raw resources
+        settles in one chunk, so an idle investor costs next to nothing until they're touched again.
+        """
+        settled = self.settled_period
+        if period <= settled:
+            return
+        producing = delivering = 0.0
+        while settled < period:
+            end = min(period, self._next_delivery(settled))
+            start = time.perf_counter()
+            self.mass_produce(runs=end - settled)
+            produced = time.perf_counter()
+            self.advance_prod_queue(end)
+            self.settled_period = settled = end
+            producing += produced - start
+            delivering += time.perf_counter() - produced
+        PHASE_SECONDS.observe(producing, "mass_produce")
+        PHASE_SECONDS.observe(delivering, "prod_queue")
+
+    def _next_delivery(self, period: int) -> float:
+        """First period after period in which a unit of an ingredient of a production target could be
+        delivered, from a job already queued or one mass_produce queues from now on (inf if there's none)"""
+        production = self.row.block.production[self.row.index].tolist()
+        needed = {name for qty, inputs in zip(production, self.market.input_products) if qty for name in inputs}
+        if not needed:
+            return math.inf
+        # anything queued from here on finishes its first unit no sooner than this
+        soonest = period + min(max(self.market.get_recipe(name).time, 1) for name in needed)
+        for jobs in [self.prod_queue] + [factory.jobs for factory in self.factories]:
+            # jobs run one after another, so only the first unfinished one that's needed matters
+            for job in jobs:
+                if job.product in needed:
+                    done = job.completed_by(period)
+                    if done < job.qty:
+                        soonest = min(soonest, job.start_period + (done // job.lines + 1) * max(job.unit_time, 1))
+                        break
+        return soonest
+    
+    def produce_asset(self, asset_name: str, qty: int, autobuy: bool = False) -> dict[str, tuple[int, float]]:
         """produce a particular asset, consuming stockpiled resources
-        TODO: buy them at current market price, maybe every resource has an autobuy setting?
+        With autobuy, missing ingredients are bought at the current market price first.
+        Returns what was bought, {symbol: (qty, price)}
         """
         if qty == 0:
-            return
-        recipe = self.portfolio.productive_assets[asset_name].recipe
+            return {}
+        recipe = self.market.get_recipe(asset_name)
         if not recipe:
             raise a.NoRecipe(f"No recipe for {asset_name}")
+        bought = self._buy_missing(recipe, qty) if autobuy else {}
         # check to ensure we have sufficient material to produce
         # we need to check all resources before spending any of them
         for ingredient in recipe.ingredients:
-            asset = self.portfolio.productive_assets[ingredient.name]
-            if asset.qty < (ingredient.qty * qty):
-                raise a.InsufficientResources(f"Insufficient {ingredient.name} to produce {asset_name}")
-        # then spend
+            if self.portfolio.get_qty(ingredient.name) < (ingredient.qty * qty):
+                raise a.InsufficientResources(f"Insufficient {ingredient.name} to produce {qty}x {asset_name}")
+        self._start_production(recipe, qty)
+        return bought
+
+    def _buy_missing(self, recipe, qty: int) -> dict[str, tuple[int, float]]:
+        """Buy whatever ingredients qty units of recipe need beyond holdings, all of them or none"""
+        prices = self.market.snapshot.prices
+        missing = {}
         for ingredient in recipe.ingredients:
-            self.portfolio.productive_assets[ingredient.name].qty -= ingredient.qty
-        # finally queue up production
-        self.prod_queue.append(recipe)
-    
-    def increment_prod_queue(self):
-        if not self.prod_queue:
-            return
-        recipe = self.prod_queue[0]
-        if recipe.time <= 0:
-            self.prod_queue.pop(0)
-            self.portfolio.productive_assets[recipe.product].qty += 1
-            self.increment_prod_queue()
-        elif recipe.time == 1:
-            self.prod_queue.pop(0)
-            self.portfolio.productive_assets[recipe.product].qty += 1
+            short = ingredient.qty * qty - self.portfolio.get_qty(ingredient.name)
+            if short > 0:
+                missing[ingredient.name] = missing.get(ingredient.name, 0) + short
+        cost = sum(prices[name] * short for name, short in missing.items())
+        if cost > self.portfolio.money:
+            raise a.InsufficientResources(f"Not enough money to buy the ingredients for {qty}x {recipe.product}")
+        return {name: (short, self.portfolio.buy_asset(name, short, price=prices[name]))
+                for name, short in missing.items()}
+
+    def _start_production(self, recipe, qty: int):
+        """Spend the ingredients for qty units of recipe and queue them up"""
+        for ingredient in recipe.ingredients:
+            self.portfolio.set_qty(ingredient.name, self.portfolio.get_qty(ingredient.name) - ingredient.qty * qty)
+        self._queue_production(recipe, qty)
+
+    def _queue_production(self, recipe, qty: int, period: int = None):
+        """Queue qty units of recipe whose ingredients have already been spent, on whichever of prod_queue and
+        the factories that can make it would finish them first. They start no sooner than period (by default
+        settled_period)."""
+        if period is None:
+            period = self.settled_period
+        best, best_time = None, finish_time(self.prod_queue, recipe, qty, period)
+        if self.factories:
+            asset = self.market.assets[recipe.product]
+            for factory in self.factories:
+                if factory.can_make(asset):
+                    done = factory.finish_time(recipe, qty, period)
+                    if done < best_time:
+                        best, best_time = factory, done
+        if best is None:
+            queue_job(self.prod_queue, recipe, qty, period)
         else:
-            recipe.time -= 1
+            best.queue(recipe, qty, period)
     
-    def get_prod_queue(self):
-        return str(self.prod_queue)
+    def advance_prod_queue(self, period: int):
+        """Deliver every unit finished by period, popping the jobs that are done"""
+        advance_jobs(self.prod_queue, period, self.portfolio)
+        for factory in self.factories:
+            factory.advance(period, self.portfolio)
+
+    def build_factory(self, kind: str, lines: int = 1) -> float:
+        """Build a factory of kind (see factories.FACTORY_TYPES) with lines production lines, returns the cost"""
+        if not isinstance(kind, str) or kind not in FACTORY_TYPES:
+            raise ValueError(f"Unknown factory {kind}, expected one of {', '.join(FACTORY_TYPES)}")
+        factory = FACTORY_TYPES[kind](lines)
+        cost = factory.line_cost * lines
+        if cost > self.portfolio.money:
+            raise a.InsufficientResources(f"Not enough money to build a {kind} with {lines} lines")
+        self.portfolio.money -= cost
+        self.factories.append(factory)
+        return cost
     
-    def mass_produce(self):
-        """Produces items in quantities specified by self.production"""
-        for asset_name, qty in self.production.items():
+    def apply_orders(self, orders: list[dict], snapshot=None) -> list[dict]:
+        """Apply a batch of buy/sell/produce orders all-or-nothing, at the prices of one MarketSnapshot
+        (the current one by default)
+
+        Each order is a dict with action, symbol and qty. Returns a result per order, or raises OrderRejected
+        after rolling everything back if any order fails.
+        """
+        prices = (snapshot or self.market.snapshot).prices
+        saved = (self.portfolio.money, dict(self.portfolio.holdings), deepcopy(self.prod_queue),
+                 deepcopy(self.factories))
+        results = []
+        for order in orders:
             try:
-                # TODO: need this to fn differently, not take time?
-                self.produce_asset(asset_name=asset_name, qty=qty)
-            except a.InsufficientResources as exc:
-                print(exc)
+                action, symbol, qty = order["action"], order["symbol"], order["qty"]
+                if action not in ORDER_ACTIONS:
+                    raise ValueError(f"Unknown action {action}, expected one of {', '.join(ORDER_ACTIONS)}")
+                if symbol not in prices:
+                    raise ValueError(f"Asset {symbol} does not exist")
+                if type(qty) != int or qty < 1:
+                    raise ValueError("qty must be a positive integer")
+                if action == "buy":
+                    self.portfolio.buy_asset(symbol, qty, price=prices[symbol])
+                elif action == "sell":
+                    self.portfolio.sell_asset(symbol, qty, price=prices[symbol])
+                else:
+                    self.produce_asset(symbol, qty)
+            except (KeyError, TypeError, ValueError, a.InsufficientResources, a.NoRecipe) as exc:
+                reason = f"missing {exc}" if isinstance(exc, KeyError) else str(exc)
+                self.portfolio.money, self.prod_queue, self.factories = saved[0], saved[2], saved[3]
+                self.portfolio.holdings.update(saved[1])
+                index = len(results)
+                for result in results:
+                    result["status"] = "rolled back"
+                results.append({"order": order, "status": "rejected", "reason": reason})
+                results.extend({"order": skipped, "status": "skipped"} for skipped in orders[index+1:])
+                raise a.OrderRejected(f"Order {index} rejected: {reason}", results)
+            result = {"order": order, "status": "filled"}
+            if action != "produce":
+                result["price"] = prices[symbol]
+            results.append(result)
+        return results
+
+    def get_prod_queue(self) -> list[dict]:
+        return [job.get_job_info() for job in self.prod_queue]
+
+    def get_factories(self) -> list[dict]:
+        return [factory.get_factory_info() for factory in self.factories]
+    
+    def mass_produce(self, runs: int = 1):
+        """Produces items in quantities specified by self.production, once per period for the `runs` periods
+        after settled_period, each period making every product in order as far as resources allow
+
+        Nothing is delivered in between, settle takes care of that. One investor at a time on a copy of their
+        row, Game.settle_all does everyone whose targets can be batched at once.
+        """
+        block, index = self.row.block, self.row.index
+        production = block.production[index].tolist()
+        if not any(production):
+            return
+        stock = block.holdings[index].tolist()
+        active = [(recipe, qty, ingredients)
+                  for recipe, qty, ingredients in zip(self.market.recipes, production, self.market.ingredient_columns)
+                  if qty]
+        period, end = self.settled_period, self.settled_period + runs
+        while active and period < end:
+            # every target makes a run each period until one of the ingredients runs short
+            per_period = {}
+            for _, qty, ingredients in active:
+                for column, need in ingredients:
+                    per_period[column] = per_period.get(column, 0) + need * qty
+            full = min([end - period] + [stock[column] // need for column, need in per_period.items()])
+            for column, need in per_period.items():
+                stock[column] -= need * full
+            self._queue_periods(active, period, full)
+            period += full
+            if period == end:
+                break
+            # then a period where some can't be made, they drop out for the rest (stock only goes down)
+            affordable = []
+            for target in active:
+                recipe, qty, ingredients = target
+                if all(stock[column] >= need * qty for column, need in ingredients):
+                    for column, need in ingredients:
+                        stock[column] -= need * qty
+                    self._queue_production(recipe, qty, period)
+                    affordable.append(target)
+                else:
+                    logger.debug("Insufficient resources to produce {}", recipe.product)
+            active = affordable
+            period += 1
+        block.holdings[index] = stock
+
+    def _queue_periods(self, active: list[tuple], period: int, periods: int):
+        """Queue a run of every active (recipe, qty, ingredients) target for each of periods periods after
+        period, as that many mass_produce calls would"""
+        if not periods:
+            return
+        if len(active) == 1 and not self.factories:
+            # the first run keeps the queue busy past the next period, so every later run joins its job
+            recipe, qty, _ = active[0]
+            self._queue_production(recipe, qty, period)
+            self.prod_queue[-1].qty += qty * (periods - 1)
+            return
+        for start in range(period, period + periods):
+            for recipe, qty, _ in active:
+                self._queue_production(recipe, qty, start)
+
+    def queue_runs(self, made: np.ndarray):
+        """Queue the units of mass_produce_rows runs, made per product, whose ingredients are already spent"""
+        for product, feasible in zip(self.market.products, made.tolist()):
+            if feasible:
+                self._queue_production(self.market.get_recipe(product), self.production[product] * feasible)
     
-    def net_worth(self):
-        total = self.portfolio.money
-        for name, asset in self.portfolio.productive_assets.items():
-            total += (asset.qty * asset.get_price())
-        return total
+    def net_worth(self, snapshot=None) -> float:
+        """Money plus holdings valued at the snapshot's prices (the current ones by default)"""
+        block, index = self.row.block, self.row.index
+        return float(block.money[index] + block.holdings[index] @ self.market.price_vector(snapshot))
     
-    def income(self) -> dict[str, dict[str, float]]:
-        """Income from mass_produce() based on current prices"""
-        income_info = {}
-        # {
-        #     name: {
-        #         "revenue": 10,
-        #         "cost": 5,
-        #     }
-        # }
-        for name, prod_qty in self.production.items():
-            asset = self.portfolio[name]
-            recipe = asset.recipe
-            revenue = asset.get_price() * prod_qty
-            income_info[name] = {"revenue": revenue}
-            if not recipe:
-                continue
-            for ingredient in recipe.ingredients:
-                price = self.productive_assets[ingredient.name].get_price()
-                cost = price * ingredient.qty * prod_qty
-                income_info[name]["cost"] = cost
-        return income_info
+    def income(self, snapshot=None) -> dict[str, dict[str, float]]:
+        """Income per period from mass_produce() at the snapshot's prices (the current ones by default)"""
+        revenue, cost = self.market.unit_economics(snapshot)
+        qty = self.row.block.production[self.row.index]
+        return {
+            product: {"revenue": product_revenue, "cost": product_cost}
+            for product, product_revenue, product_cost in zip(self.market.products, (revenue * qty).tolist(),
+                                                               (cost * qty).tolist())
+        }
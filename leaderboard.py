@@ -0,0 +1,91 @@
+import bisect
+import threading
+
+import numpy as np
+
+LEADERBOARD_SIZE = 100  # places anyone can ask for
+CANDIDATES = 2  # investors kept ranked per place, so trades can shuffle the top without a full refresh
+
+
+class Leaderboard:
+    """Investors ranked by net worth, readable in O(k) for the top k however many investors there are
+
+    Once per tick (as a GameClock listener) every investor is valued at once from the holdings table, money plus
+    holdings times the price vector, and the best CANDIDATES * size are picked with argpartition and kept sorted
+    with bisect. Everyone else is worth at most floor. Nobody is settled for it: finished production counts once
+    its investor is next settled, like everything else about them.
+    Trades in between re-value just the investor who made them, at the prices of the last refresh. A
+    candidate stays ranked whatever they do, anyone else joins once they're worth more than floor, so every
+    candidate worth at least floor is in its exact place. If fewer than k of them are left, it refreshes early.
+    """
+    def __init__(self, game, size: int = LEADERBOARD_SIZE):
+        self.game = game
+        self.size = size
+        self._lock = threading.Lock()
+        self._keys = []  # -net worth of each candidate, ascending so the richest come first
+        self._names = []  # username of each candidate, in the same order
+        self._worth = {}  # username -> net worth of the candidates
+        self._floor = float("inf")  # nobody but the candidates is worth more than this
+        self._prices = None
+        self.period = None  # period of the prices investors were valued at
+
+    def __call__(self, game):
+        self.refresh()
+
+    def refresh(self):
+        """Value every investor at the current prices, and rank the richest"""
+        snapshot = self.game.market.snapshot
+        prices = self.game.market.price_vector(snapshot)
+        with self._lock:
+            worth, owners = [], []
+            for block in self.game.holdings.blocks:
+                n = block.used
+                worth.append(block.money[:n] + block.holdings[:n] @ prices)
+                owners.extend(block.owners[:n])
+            worth = np.concatenate(worth) if worth else np.zeros(0)
+            n_candidates = self.size * CANDIDATES
+            if len(worth) > n_candidates:
+                top = np.argpartition(worth, -n_candidates)[-n_candidates:]
+                floor = float(np.delete(worth, top).max())
+            else:
+                top = np.arange(len(worth))
+                floor = float("-inf")
+            worth = worth.tolist()
+            ranked = sorted((-worth[i], owners[i].username) for i in top.tolist() if owners[i] is not None)
+            self._keys = [key for key, _ in ranked]
+            self._names = [name for _, name in ranked]
+            self._worth = {name: -key for key, name in ranked}
+            self._floor = floor
+            self._prices = prices
+            self.period = snapshot.period
+
+    def update(self, username: str, investor):
+        """Re-value an investor who just traded, call it while still holding investor's lock"""
+        with self._lock:
+            if self._prices is None:
+                return
+            row = investor.row
+            worth = row.block.money.item(row.index) + float(row.block.holdings[row.index] @ self._prices)
+            old = self._worth.pop(username, None)
+            if old is not None:
+                i = bisect.bisect_left(self._keys, -old)
+                i = self._names.index(username, i)
+                del self._keys[i], self._names[i]
+            elif worth <= self._floor:
+                return
+            i = bisect.bisect_right(self._keys, -worth)
+            self._keys.insert(i, -worth)
+            self._names.insert(i, username)
+            self._worth[username] = worth
+
+    def top(self, k: int = LEADERBOARD_SIZE) -> list[dict]:
+        """The k richest investors, best first, as {rank, username, net_worth}"""
+        k = min(k, self.size)
+        with self._lock:
+            exact = bisect.bisect_right(self._keys, -self._floor)
+            stale = exact < k and self._floor != float("-inf")
+        if stale:
+            self.refresh()
+        with self._lock:
+            return [{"rank": rank, "username": name, "net_worth": -key}
+                    for rank, (key, name) in enumerate(zip(self._keys[:k], self._names[:k]), start=1)]
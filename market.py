@@ -0,0 +1,99 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+import numpy as np
+import assets as a
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Every symbol's price at one period. Never changes once published, so it can be read without a lock"""
+    period: int
+    prices: MappingProxyType
+
+
+class Market:
+    """One price series per symbol, shared by every investor in a Game"""
+    def __init__(self, seed=None):
+        # held while simulating, series buffers move around when they grow or compact
+        self.lock = threading.RLock()
+        # an independent random stream per asset, all derived from seed so a seeded market is reproducible
+        seeds = np.random.SeedSequence(seed).spawn(7)
+        self.assets = {
+            "obtainium": a.Obtainium(seeds[0]),
+            "eludium": a.Eludium(seeds[1]),
+            "unobtainium": a.Unobtainium(seeds[2]),
+            "widget": a.Widget(seeds[3]),
+            "gizmo": a.Gizmo(seeds[4]),
+            "doohickey": a.Doohickey(seeds[5]),
+            "gadget": a.Gadget(seeds[6])
+        }
+        # products with a recipe, and how many units of each symbol (columns) one unit of each (rows) consumes
+        self.products = [symbol for symbol, asset in self.assets.items() if asset.recipe]
+        self.ingredient_matrix = np.zeros((len(self.products), len(self.assets)))
+        columns = {symbol: i for i, symbol in enumerate(self.assets)}
+        for row, product in enumerate(self.products):
+            for ingredient in self.assets[product].recipe.ingredients:
+                self.ingredient_matrix[row, columns[ingredient.name]] += ingredient.qty
+        self.product_index = [columns[product] for product in self.products]
+        self.recipes = [self.assets[product].recipe for product in self.products]
+        # the same, sparse: (column, qty) of each ingredient per product, for one investor at a time
+        self.ingredient_columns = [
+            [(int(j), int(row[j])) for j in np.flatnonzero(row)] for row in self.ingredient_matrix
+        ]
+        # ingredients of each product that are products themselves, made rather than bought from the ground
+        self.input_products = [
+            [self.symbols[j] for j, _ in ingredients if self.symbols[j] in self.products]
+            for ingredients in self.ingredient_columns
+        ]
+        self._price_vector = None  # (period, prices of self.symbols), see price_vector
+        self.snapshot = None
+        self._publish(0)
+
+    @property
+    def current_period(self) -> int:
+        return self.snapshot.period
+
+    def _publish(self, period: int):
+        """Swap in a new snapshot, readers see either the old one or the new one"""
+        prices = {symbol: asset.get_price(period) for symbol, asset in self.assets.items()}
+        self.snapshot = MarketSnapshot(period, MappingProxyType(prices))
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self.assets)
+
+    def get_price(self, symbol: str, period: int = None) -> float:
+        """Price of symbol at period (defaults to the current period, read from the snapshot without locking)"""
+        if period is None:
+            return self.snapshot.prices[symbol]
+        with self.lock:
+            return self.assets[symbol].get_price(period)
+
+    def price_vector(self, snapshot: MarketSnapshot = None) -> np.ndarray:
+        """Read-only array of every price in self.symbols order at the snapshot's period (the current one by
+        default), built once per period"""
+        snapshot = snapshot or self.snapshot
+        cached = self._price_vector
+        if cached is None or cached[0] != snapshot.period:
+            vector = np.array([snapshot.prices[symbol] for symbol in self.symbols])
+            vector.flags.writeable = False
+            cached = self._price_vector = (snapshot.period, vector)
+        return cached[1]
+
+    def unit_economics(self, snapshot: MarketSnapshot = None) -> tuple[np.ndarray, np.ndarray]:
+        """(revenue, cost) of producing one unit of each of self.products at the snapshot's prices"""
+        prices = self.price_vector(snapshot)
+        return prices[self.product_index], self.ingredient_matrix @ prices
+
+    def get_recipe(self, symbol: str):
+        return self.assets[symbol].recipe
+
+    def gen_price_figure(self, symbol: str, start: int, end: int, points: int = None):
+        with self.lock:
+            return self.assets[symbol].gen_price_figure(start, end, points=points)
+
+    def advance_to(self, period: int):
+        """Simulate every asset up to period and publish it as the current period"""
+        with self.lock:
+            self._publish(period)
@@ -0,0 +1,151 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds, from a fast in-memory request up to a long catch-up tick
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """One metric family in Prometheus text format, a value per combination of label values"""
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        """(name suffix, label string, value) for every sample"""
+        with self._lock:
+            return [("", _labels(self.labels, key), value) for key, value in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {value!r}" for suffix, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    """Set directly, or read from a callback returning {label values: value} at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels: tuple = (), callback=None):
+        super().__init__(name, description, labels)
+        self.callback = callback
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        if self.callback is None:
+            return super().samples()
+        return [("", _labels(self.labels, key), value) for key, value in self.callback().items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                # a count per bucket (plus +Inf), then the sum
+                counts = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        samples = []
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                samples.append(("_bucket", _labels(self.labels + ("le",), key + (bound,)), cumulative))
+            samples.append(("_sum", _labels(self.labels, key), counts[-1]))
+            samples.append(("_count", _labels(self.labels, key), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        """Every metric in Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# the hot paths, recorded where they happen
+REQUEST_SECONDS = REGISTRY.histogram(
+    "widget_request_seconds", "Time to handle a request", ("method", "route", "status")
+)
+PHASE_SECONDS = REGISTRY.histogram(
+    "widget_phase_seconds",
+    "Time spent per phase: pricing per tick, mass_produce and prod_queue per investor settled", ("phase",)
+)
+PERIODS_SIMULATED = REGISTRY.counter("widget_periods_simulated_total", "Periods the market has been advanced")
+SIMULATION_RATE = REGISTRY.gauge(
+    "widget_periods_per_second", "Periods simulated per second of pricing time in the last tick"
+)
+
+
+def watch_game(game):
+    """Report the game's investor count and each asset's price history memory at scrape time"""
+    REGISTRY.gauge("widget_investors", "Investors in the game", callback=lambda: {(): game.investor_count()})
+    REGISTRY.gauge(
+        "widget_price_history_bytes", "Memory held by each asset's price history", ("symbol",),
+        callback=lambda: {(symbol,): asset.history_nbytes for symbol, asset in game.market.assets.items()}
+    )
+    REGISTRY.gauge("widget_period", "Current period", callback=lambda: {(): game.current_period})
+    REGISTRY.gauge("widget_holdings_bytes", "Memory held by the investor holdings table",
+                   callback=lambda: {(): game.holdings.nbytes})
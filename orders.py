@@ -0,0 +1,147 @@
+import bisect
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+
+ORDER_TYPES = ("limit", "stop")
+RESTING_ACTIONS = ("buy", "sell", "produce")
+HISTORY_LENGTH = 100  # finished orders kept per investor
+
+
+@dataclass()
+class RestingOrder:
+    """An order that waits in the OrderBook until the price of symbol crosses price
+
+    limit buy: price falls to or below it. limit sell: rises to or above it.
+    stop buy: rises to or above it. stop sell: falls to or below it.
+    limit produce: the product rises to or above it, missing ingredients are bought when it fills.
+    """
+    id: int
+    username: str
+    action: str
+    symbol: str
+    qty: int
+    order_type: str
+    price: float
+    period: int  # period it was placed in
+
+    @property
+    def fills_below(self) -> bool:
+        """True if it fills when the price falls to price, False if when it rises to it"""
+        return (self.action == "buy") == (self.order_type == "limit")
+
+    def get_order_info(self) -> dict:
+        return asdict(self)
+
+
+class OrderBook:
+    """Every resting order, indexed per symbol by trigger price
+
+    Each symbol has two lists of (price, id) kept sorted with bisect: orders filling when the price falls to
+    their trigger and orders filling when it rises to it. Finding the orders a new price crosses is a binary
+    search plus the crossed orders themselves, however many orders are resting.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._next_id = 1
+        self._orders = {}
+        self._by_user = {}
+        self._below = {}
+        self._above = {}
+        self.history = {}  # username -> recent finished orders with their result
+
+    def _index(self, order: RestingOrder) -> list:
+        index = self._below if order.fills_below else self._above
+        return index.setdefault(order.symbol, [])
+
+    def place(self, username: str, action: str, symbol: str, qty: int, order_type: str, price: float,
+              period: int) -> RestingOrder:
+        if action not in RESTING_ACTIONS:
+            raise ValueError(f"Unknown action {action}, expected one of {', '.join(RESTING_ACTIONS)}")
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"Unknown order type {order_type}, expected one of {', '.join(ORDER_TYPES)}")
+        if action == "produce" and order_type != "limit":
+            raise ValueError("Production can only be ordered at a limit")
+        if not isinstance(qty, int) or isinstance(qty, bool) or qty < 1:
+            raise ValueError("qty must be a positive integer")
+        if not isinstance(price, (int, float)) or isinstance(price, bool) or price <= 0:
+            raise ValueError("price must be a positive number")
+        with self.lock:
+            order = RestingOrder(self._next_id, username, action, symbol, qty, order_type, float(price), period)
+            self._add(order)
+        return order
+
+    def _add(self, order: RestingOrder):
+        if order.id in self._orders:
+            return
+        self._next_id = max(self._next_id, order.id + 1)
+        self._orders[order.id] = order
+        self._by_user.setdefault(order.username, set()).add(order.id)
+        bisect.insort(self._index(order), (order.price, order.id))
+
+    def _remove(self, order_id: int) -> RestingOrder:
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return None
+        self._by_user[order.username].discard(order_id)
+        index = self._index(order)
+        del index[bisect.bisect_left(index, (order.price, order_id))]
+        return order
+
+    def cancel(self, username: str, order_id: int) -> RestingOrder:
+        """Remove one of username's orders, raises KeyError if they have no such order"""
+        with self.lock:
+            order = self._orders.get(order_id)
+            if order is None or order.username != username:
+                raise KeyError(order_id)
+            return self._remove(order_id)
+
+    def discard(self, order_id: int):
+        """Remove an order if it's still resting"""
+        with self.lock:
+            self._remove(order_id)
+
+    def crossed(self, prices) -> list[RestingOrder]:
+        """Remove and return every order the prices cross, oldest first"""
+        crossed = []
+        with self.lock:
+            for symbol, price in prices.items():
+                # waiting for the price to fall to their trigger, so triggers at or above the price are crossed
+                below = self._below.get(symbol)
+                if below:
+                    crossed.extend(order_id for _, order_id in below[bisect.bisect_left(below, (price,)):])
+                above = self._above.get(symbol)
+                if above:
+                    cut = bisect.bisect_right(above, (price, float("inf")))
+                    crossed.extend(order_id for _, order_id in above[:cut])
+            return [self._remove(order_id) for order_id in sorted(crossed)]
+
+    def finish(self, order: RestingOrder, result: dict):
+        """Keep the outcome of a crossed order where its investor can see it"""
+        with self.lock:
+            history = self.history.setdefault(order.username, deque(maxlen=HISTORY_LENGTH))
+            history.append({**order.get_order_info(), **result})
+
+    def get_orders(self, username: str) -> list[dict]:
+        with self.lock:
+            return [self._orders[order_id].get_order_info() for order_id in sorted(self._by_user.get(username, ()))]
+
+    def get_history(self, username: str) -> list[dict]:
+        with self.lock:
+            return list(self.history.get(username, ()))
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def get_state(self) -> list[dict]:
+        with self.lock:
+            return [order.get_order_info() for order in self._orders.values()]
+
+    def set_state(self, orders: list[dict]):
+        with self.lock:
+            for order in orders:
+                if "type" in order:
+                    # saved before order_type was renamed
+                    order = {**order, "order_type": order["type"]}
+                    del order["type"]
+                self._add(RestingOrder(**order))
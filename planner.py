@@ -0,0 +1,102 @@
+import numpy as np
+
+PLAN_HORIZON = 300  # periods of production line time to plan for, the longest recipe takes this long
+PLAN_METHOD = "greedy"  # reported with every plan, see Planner.recommend
+
+
+class Planner:
+    """Recipe profitability at market prices, and a production plan that makes good use of it
+
+    Every recipe is a row of the market's ingredient matrix, so the margins of all of them are one
+    matrix-vector product with the price vector. They're computed once per period and shared by every
+    investor asking for a plan.
+    """
+    def __init__(self, market):
+        self.market = market
+        self.unit_times = np.array([max(market.get_recipe(product).time, 1) for product in market.products])
+        self._margins = None  # (period, margins) of the last period asked for
+
+    def margins(self, snapshot=None) -> dict[str, dict[str, float]]:
+        """Revenue, ingredient cost and margin of one unit of every product, and margin per period of
+        production line time, at the snapshot's prices (the current ones by default)"""
+        snapshot = snapshot or self.market.snapshot
+        cached = self._margins
+        if cached is None or cached[0] != snapshot.period:
+            revenue, cost = self.market.unit_economics(snapshot)
+            margin = revenue - cost
+            per_period = margin / self.unit_times
+            cached = self._margins = (snapshot.period, {
+                product: {
+                    "revenue": float(revenue[i]),
+                    "cost": float(cost[i]),
+                    "margin": float(margin[i]),
+                    "margin_per_period": float(per_period[i]),
+                    "time": int(self.unit_times[i]),
+                }
+                for i, product in enumerate(self.market.products)
+            })
+        return cached[1]
+
+    def recommend(self, holdings: dict[str, int], money: float, horizon: int = PLAN_HORIZON,
+                  snapshot=None) -> dict:
+        """Units of each product to produce over the next horizon periods, for a good profit
+
+        A heuristic, not an optimum: production is one job at a time, so line time is filled greedily with
+        the products with the best margin per period, each as far as holdings and money allow, before moving
+        on to the next. A mix of lower-margin products can beat it when money rather than line time runs out
+        first. It plans one-off production orders, not the per-period Investor.production targets.
+        Ingredients come out of holdings, anything missing is bought with money at market price. Returns the
+        units per product, what to buy, the expected profit and the orders that carry the plan out through
+        apply_orders.
+        """
+        margins = self.margins(snapshot)
+        prices = self.market.price_vector(snapshot)
+        symbols = self.market.symbols
+        stock = np.array([holdings.get(symbol, 0) for symbol in symbols], dtype=float)
+        to_buy = np.zeros(len(symbols))
+        line_time = horizon
+        units = {}
+        profit = 0.0
+        ranked = sorted(range(len(self.market.products)),
+                        key=lambda i: margins[self.market.products[i]]["margin_per_period"], reverse=True)
+        for i in ranked:
+            product = self.market.products[i]
+            if margins[product]["margin"] <= 0 or line_time < self.unit_times[i]:
+                continue
+            row = self.market.ingredient_matrix[i]
+            n = self._affordable(row, stock, money, prices, int(line_time // self.unit_times[i]))
+            if not n:
+                continue
+            missing = np.maximum(row * n - stock, 0)
+            money -= float(missing @ prices)
+            stock += missing - row * n
+            to_buy += missing
+            units[product] = n
+            profit += n * margins[product]["margin"]
+            line_time -= n * self.unit_times[i]
+        buy = {symbol: int(qty) for symbol, qty in zip(symbols, to_buy) if qty}
+        orders = [{"action": "buy", "symbol": symbol, "qty": qty} for symbol, qty in buy.items()]
+        orders += [{"action": "produce", "symbol": product, "qty": n} for product, n in units.items()]
+        return {
+            "method": PLAN_METHOD,
+            "horizon": horizon,
+            "units": units,
+            "buy": buy,
+            "profit": profit,
+            "idle_periods": int(line_time),
+            "orders": orders,
+        }
+
+    @staticmethod
+    def _affordable(row: np.ndarray, stock: np.ndarray, money: float, prices: np.ndarray, limit: int) -> int:
+        """Most units (up to limit) whose ingredients are covered by stock plus what money can buy"""
+        def shortfall(n: int) -> float:
+            return float(np.maximum(row * n - stock, 0) @ prices)
+        lo, hi = 0, limit
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if shortfall(mid) <= money:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
@@ -0,0 +1,256 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Retention:
+    """How much history a PriceSeries keeps
+
+    The most recent `full` periods stay at full resolution. Older periods are compacted into OHLC bars,
+    one tier per (bar width, max bars) pair, finest first. Bars that fall off the last tier are dropped.
+    The defaults match the constants in GARCH.py: 90 periods per trading day, 2250 per week.
+    """
+    full: int = 21600
+    tiers: tuple = ((90, 2400), (2250, 4096))
+
+    def __post_init__(self):
+        if self.full < 1:
+            raise ValueError("Retention must keep at least one full resolution period")
+        widths = [width for width, _ in self.tiers]
+        for finer, coarser in zip(widths, widths[1:]):
+            if coarser % finer:
+                raise ValueError(f"Bar width {coarser} is not a multiple of {finer}")
+
+
+class _Bars:
+    """OHLC bars of a fixed width, the first one starting at period `start`"""
+    FIELDS = ("open", "high", "low", "close")
+
+    def __init__(self, width: int, max_bars: int, start: int = 0):
+        self.width = width
+        self.max_bars = max_bars
+        self.start = start
+        self.data = {field: np.empty(0) for field in self.FIELDS}
+
+    def __len__(self) -> int:
+        return len(self.data["close"])
+
+    @property
+    def end(self) -> int:
+        """First period after the last bar"""
+        return self.start + len(self) * self.width
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.data.values())
+
+    def append(self, bars: dict[str, np.ndarray]):
+        for field in self.FIELDS:
+            self.data[field] = np.concatenate((self.data[field], bars[field]))
+
+    def pop_front(self, n: int) -> dict[str, np.ndarray]:
+        """Remove the n oldest bars and return them"""
+        popped = {field: values[:n] for field, values in self.data.items()}
+        self.data = {field: values[n:].copy() for field, values in self.data.items()}
+        self.start += n * self.width
+        return popped
+
+
+def _fold(bars: dict[str, np.ndarray], factor: int) -> dict[str, np.ndarray]:
+    """Merge every `factor` consecutive bars into one"""
+    grouped = {field: values.reshape(-1, factor) for field, values in bars.items()}
+    return {
+        "open": grouped["open"][:, 0],
+        "high": grouped["high"].max(axis=1),
+        "low": grouped["low"].min(axis=1),
+        "close": grouped["close"][:, -1],
+    }
+
+
+class PriceSeries:
+    """Columnar storage for a simulated price series
+
+    Columns are preallocated and doubled in capacity when full, so appending a period is O(1) amortized
+    instead of copying every column on every tick.
+
+    With a Retention only the most recent periods are kept in the columns, which start at period `offset`.
+    Older prices are kept as OHLC bars by compact(), so memory stays bounded however long the series runs.
+    """
+    COLUMNS = ("eps", "sigma", "r", "cr", "price")
+
+    def __init__(self, capacity: int = 1024, retention: Retention = None):
+        self._len = 0
+        self.offset = 0
+        self.retention = retention
+        self.tiers = [_Bars(width, max_bars) for width, max_bars in retention.tiers] if retention else []
+        self._columns = {name: np.empty(capacity) for name in self.COLUMNS}
+
+    def __len__(self) -> int:
+        """Number of periods simulated so far, including compacted ones"""
+        return self.offset + self._len
+
+    @property
+    def capacity(self) -> int:
+        return len(self._columns["price"])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self._columns.values()) + sum(tier.nbytes for tier in self.tiers)
+
+    @property
+    def layout(self) -> tuple:
+        """Period each resolution starts at, full resolution first. It changes whenever compact() folds periods
+        into bars, and until it does closes() gives the same points for any range it's asked for again."""
+        return (self.offset, *(tier.start for tier in self.tiers))
+
+    def _resize(self, capacity: int):
+        for name, old in self._columns.items():
+            new = np.empty(capacity)
+            new[:self._len] = old[:self._len]
+            self._columns[name] = new
+
+    def extend(self, n: int) -> dict[str, np.ndarray]:
+        """Grow the series by n periods and return writable views of every retained column.
+        Index 0 of the views is period `offset`. The new periods are uninitialized, the caller is expected
+        to fill them in."""
+        if n < 0:
+            raise ValueError(f"Can't extend a series by {n} periods")
+        size = self._len + n
+        if size > self.capacity:
+            self._resize(max(size, 2 * self.capacity))
+        self._len = size
+        return {name: column[:self._len] for name, column in self._columns.items()}
+
+    def view(self, name: str) -> np.ndarray:
+        """Read-only view of a column, index 0 is period `offset`"""
+        view = self._columns[name][:self._len]
+        view.flags.writeable = False
+        return view
+
+    def value_at(self, name: str, period: int) -> float:
+        """Full resolution value of a column at period"""
+        if not self.offset <= period < len(self):
+            raise IndexError(f"Period {period} is not retained at full resolution")
+        return self._columns[name][period - self.offset]
+
+    def price_at(self, period: int) -> float:
+        """Price at period. Compacted periods return the close of the bar containing them."""
+        if period < 0:
+            raise IndexError(f"Period {period} is before the start of the series")
+        if period >= self.offset:
+            return self.value_at("price", period)
+        for tier in self.tiers:
+            if period >= tier.start:
+                return tier.data["close"][(period - tier.start) // tier.width]
+        raise IndexError(f"Period {period} is no longer retained")
+
+    def closes(self, start: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        """(periods, prices) for [start, end), like range(). Compacted ranges give one point per bar,
+        at the bar's first period with its close."""
+        end = min(end, len(self))
+        sources = [(tier.start, tier.end, tier.width, tier.data["close"]) for tier in reversed(self.tiers)]
+        sources.append((self.offset, len(self), 1, self._columns["price"][:self._len]))
+        periods, prices = [], []
+        for src_start, src_end, width, values in sources:
+            lo, hi = max(start, src_start), min(end, src_end)
+            if lo >= hi:
+                continue
+            first = (lo - src_start) // width
+            last = -(-(hi - src_start) // width)  # ceil
+            periods.append(src_start + np.arange(first, last) * width)
+            prices.append(values[first:last])
+        if not periods:
+            return np.empty(0, dtype=int), np.empty(0)
+        return np.concatenate(periods), np.concatenate(prices)
+
+    def get_arrays(self) -> dict[str, np.ndarray]:
+        """Every array needed to rebuild the series with from_arrays, keyed by a file-name-safe label"""
+        arrays = {name: self.view(name) for name in self.COLUMNS}
+        for tier in self.tiers:
+            for field, values in tier.data.items():
+                arrays[f"bars{tier.width}_{field}"] = values
+        return arrays
+
+    def get_meta(self) -> dict:
+        return {
+            "offset": self.offset,
+            "retention": {"full": self.retention.full, "tiers": self.retention.tiers} if self.retention else None,
+            "tier_starts": [tier.start for tier in self.tiers],
+        }
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict[str, np.ndarray]) -> "PriceSeries":
+        """Rebuild a series saved with get_meta/get_arrays. The arrays are used as they are (memory-mapped
+        ones stay memory-mapped) until the series first has to grow."""
+        retention = meta["retention"]
+        if retention:
+            retention = Retention(full=retention["full"], tiers=tuple(tuple(tier) for tier in retention["tiers"]))
+        series = cls(capacity=0, retention=retention)
+        series._columns = {name: arrays[name] for name in cls.COLUMNS}
+        series._len = len(arrays["price"])
+        series.offset = meta["offset"]
+        for tier, start in zip(series.tiers, meta["tier_starts"]):
+            tier.start = start
+            tier.data = {field: arrays[f"bars{tier.width}_{field}"] for field in tier.FIELDS}
+        return series
+
+    def compact(self):
+        """Apply the retention policy: fold old periods into bars and free them from the columns
+
+        Only runs once the columns hold twice the full resolution window, so the copying is amortized.
+        """
+        if not self.retention or not self.tiers or self._len < 2 * self.retention.full:
+            return
+        first = self.tiers[0]
+        cut = (len(self) - self.retention.full) // first.width * first.width
+        n = cut - self.offset
+        if n <= 0:
+            return
+        prices = self._columns["price"][:n].reshape(-1, first.width)
+        first.append({
+            "open": prices[:, 0],
+            "high": prices.max(axis=1),
+            "low": prices.min(axis=1),
+            "close": prices[:, -1],
+        })
+        for name, column in self._columns.items():
+            column[:self._len - n] = column[n:self._len]
+        self._len -= n
+        self.offset = cut
+        if self.capacity > 4 * max(self._len, 1024):
+            self._resize(max(2 * self._len, 1024))
+
+        for finer, coarser in zip(self.tiers, self.tiers[1:] + [None]):
+            excess = len(finer) - finer.max_bars
+            if excess <= 0:
+                continue
+            if coarser is None:
+                finer.pop_front(excess)
+                continue
+            factor = coarser.width // finer.width
+            n_bars = -(-excess // factor) * factor  # whole coarser bars only
+            if n_bars > len(finer):
+                n_bars = len(finer) // factor * factor
+            coarser.append(_fold(finer.pop_front(n_bars), factor))
+
+
+def decimate(periods: np.ndarray, prices: np.ndarray, points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Downsample to at most `points` points, keeping the min and max of each bucket in time order
+    so spikes and crashes survive at any resolution"""
+    n = len(prices)
+    buckets = max(points // 2, 1)
+    if n <= points or n <= 2 * buckets:
+        return periods, prices
+    size = -(-n // buckets)  # ceil
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = prices
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.nanargmin(padded, axis=1)
+    highs = offsets + np.nanargmax(padded, axis=1)
+    picks = np.sort(np.stack((lows, highs), axis=1), axis=1).ravel()
+    # flat buckets pick the same point twice
+    picks = picks[np.concatenate(([True], np.diff(picks) > 0))]
+    return periods[picks], prices[picks]
@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+from loguru import logger
+
+import assets as a
+from game import Game
+
+SNAPSHOT_PREFIX = "snapshot-"
+LATEST_FILE = "LATEST"
+KEEP_SNAPSHOTS = 2  # older snapshots are deleted once a new one is complete
+
+
+class TradeJournal:
+    """Append-only log of every trade, one json object per line
+
+    Each entry gets a sequence number. An investor's state records the last one applied to it, so replaying
+    the journal on top of a snapshot applies exactly the trades made after the snapshot was taken. Every
+    snapshot rotates out the entries it already has, so the journal only ever holds the trades since the last one.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.seq = self._last_seq()
+        self._file = open(path, "a", buffering=1)  # line buffered, every entry is written out straight away
+
+    def _last_seq(self) -> int:
+        """Sequence number of the last entry, read back from the end of the file. A line torn by a crash
+        mid-write is cut off, so the next entry starts on a line of its own."""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "rb+") as f:
+            pos = end = f.seek(0, os.SEEK_END)
+            tail = b""
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                tail = f.read(step) + tail
+                last = tail.rfind(b"\n")
+                if last > 0 and tail.rfind(b"\n", 0, last) >= 0:
+                    break
+            last = tail.rfind(b"\n")
+            if pos + last + 1 < end:
+                logger.warning(f"Cutting off a torn entry at the end of {self.path}")
+                f.truncate(pos + last + 1)
+        if last < 0:
+            return 0
+        return json.loads(tail[tail.rfind(b"\n", 0, last) + 1:last])["seq"]
+
+    def append(self, entry: dict) -> int:
+        """Write an entry and return its sequence number"""
+        with self._lock:
+            self.seq += 1
+            self._file.write(json.dumps({"seq": self.seq, **entry}) + "\n")
+            return self.seq
+
+    def read(self):
+        """Every entry in order, a line torn by a crash mid-write is skipped"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping torn entry in {self.path}: {line.strip()[:80]}")
+
+    def rotate(self, seq: int):
+        """Drop every entry up to and including seq, once a snapshot has them all"""
+        with self._lock:
+            self._file.close()
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                for entry in self.read():
+                    if entry["seq"] > seq:
+                        f.write(json.dumps(entry) + "\n")
+            os.replace(tmp, self.path)
+            self._file = open(self.path, "a", buffering=1)
+
+    def close(self):
+        self._file.close()
+
+
+def latest_snapshot(directory: str) -> str:
+    """Path of the last complete snapshot in directory, None if there isn't one"""
+    try:
+        with open(os.path.join(directory, LATEST_FILE)) as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def save_snapshot(game: Game, directory: str) -> str:
+    """Write the game to a new snapshot in directory and return its path
+
+    Price arrays are written as raw .npy files, everything else to game.json. The LATEST file is only
+    pointed at the snapshot once it's complete, so a crash mid-save leaves the previous one in place.
+    """
+    os.makedirs(directory, exist_ok=True)
+    # every trade journaled up to here is in the investors' states below, each is read under its investor's lock
+    journal_seq = game.journal.seq if game.journal is not None else 0
+    tmp = os.path.join(directory, f"{SNAPSHOT_PREFIX}tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    markets = {}
+    # hold the market still so every series and the period agree
+    with game.market.lock:
+        period = game.current_period
+        for symbol, asset in game.market.assets.items():
+            meta, arrays = asset.get_series_state()
+            os.makedirs(os.path.join(tmp, "markets", symbol))
+            for name, values in arrays.items():
+                np.save(os.path.join(tmp, "markets", symbol, f"{name}.npy"), values)
+            markets[symbol] = meta
+    investors = {}
+    for username, investor in game.get_investors().items():
+        with investor.lock:
+            investors[username] = investor.get_state()
+    # every journal entry up to here has already changed the order book, see replay_journal
+    orders_seq = game.journal.seq if game.journal is not None else 0
+    orders = game.orders.get_state()
+    with open(os.path.join(tmp, "game.json"), "w") as f:
+        json.dump({"period": period, "markets": markets, "investors": investors, "orders": orders,
+                   "orders_seq": orders_seq, "journal_seq": journal_seq}, f)
+
+    name = f"{SNAPSHOT_PREFIX}{period}"
+    path = os.path.join(directory, name)
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp, path)
+    with open(os.path.join(directory, f"{LATEST_FILE}.tmp"), "w") as f:
+        f.write(name)
+    os.replace(os.path.join(directory, f"{LATEST_FILE}.tmp"), os.path.join(directory, LATEST_FILE))
+
+    periods = sorted(
+        int(entry[len(SNAPSHOT_PREFIX):]) for entry in os.listdir(directory)
+        if entry.startswith(SNAPSHOT_PREFIX) and entry[len(SNAPSHOT_PREFIX):].isdigit()
+    )
+    for old in periods[:-KEEP_SNAPSHOTS]:
+        shutil.rmtree(os.path.join(directory, f"{SNAPSHOT_PREFIX}{old}"), ignore_errors=True)
+    if game.journal is not None:
+        game.journal.rotate(journal_seq)
+    logger.info(f"Saved snapshot of period {period} to {path}")
+    return path
+
+
+def load_snapshot(directory: str, journal: TradeJournal = None, until_period: int = None) -> Game:
+    """Rebuild the game from the latest snapshot in directory
+
+    Price arrays are memory-mapped rather than read or re-simulated, so this takes about as long with
+    millions of periods of history as with a hundred. With a journal, every trade made after the snapshot
+    (up to and including until_period) is replayed on top of it, and the journal carries on numbering from
+    the snapshot even if rotating it left it empty.
+    """
+    path = latest_snapshot(directory)
+    if path is None:
+        raise FileNotFoundError(f"No snapshot in {directory}")
+    with open(os.path.join(path, "game.json")) as f:
+        state = json.load(f)
+    game = Game()
+    with game.market.lock:
+        for symbol, meta in state["markets"].items():
+            folder = os.path.join(path, "markets", symbol)
+            arrays = {
+                file[:-len(".npy")]: np.load(os.path.join(folder, file), mmap_mode="c")
+                for file in os.listdir(folder)
+            }
+            game.market.assets[symbol].restore_series(meta, arrays)
+        game.market.advance_to(state["period"])
+    for username, investor_state in state["investors"].items():
+        game.add_investor(username, investor_state)
+    game.orders.set_state(state.get("orders", []))
+    if journal is not None:
+        journal.seq = max(journal.seq, state.get("journal_seq", 0))
+        replay_journal(game, journal, until_period, orders_seq=state.get("orders_seq", 0),
+                       journal_seq=state.get("journal_seq", 0))
+    return game
+
+
+def replay_journal(game: Game, journal: TradeJournal, until_period: int = None, orders_seq: int = 0,
+                   journal_seq: int = 0) -> int:
+    """Apply journal entries the game's investors haven't seen yet, returns the number applied
+
+    Trades are applied at the price recorded in the journal, so the market doesn't have to be advanced to
+    the period they were made in. Order book changes after orders_seq are applied too, they're idempotent
+    so an entry the book already reflects does no harm. Entries up to journal_seq are already in the snapshot,
+    they're only still there if it was taken just before a crash, before the journal was rotated. A trade that
+    no longer goes through is logged and skipped rather than stopping the replay.
+    """
+    applied = failed = 0
+    for entry in journal.read():
+        if entry["seq"] <= journal_seq:
+            continue
+        if until_period is not None and entry["period"] > until_period:
+            break
+        if entry["seq"] > orders_seq:
+            if entry["action"] == "place":
+                game.orders.set_state([entry["order"]])
+            elif "order_id" in entry:
+                # cancelled, or filled by the trade below
+                game.orders.discard(entry["order_id"])
+        investor = game.add_investor(entry["username"], period=entry["period"])
+        if entry["seq"] <= investor.journal_seq or entry["action"] in ("place", "cancel"):
+            continue
+        with investor.lock:
+            investor.settle(entry["period"])
+            try:
+                if entry["action"] == "buy":
+                    investor.portfolio.buy_asset(entry["symbol"], entry["qty"], price=entry["price"])
+                elif entry["action"] == "sell":
+                    investor.portfolio.sell_asset(entry["symbol"], entry["qty"], price=entry["price"])
+                elif entry["action"] == "build":
+                    investor.build_factory(entry["symbol"], entry["qty"])
+                else:
+                    investor.produce_asset(entry["symbol"], entry["qty"])
+            except (a.InsufficientResources, a.NoRecipe, a.OrderRejected, KeyError, ValueError) as exc:
+                # it went through the first time, so the state it's replayed onto has drifted, carry on without it
+                logger.warning(f"Skipping journal entry {entry['seq']} for {entry['username']}: {exc!r}")
+                failed += 1
+            else:
+                applied += 1
+            investor.journal_seq = entry["seq"]
+    logger.info(f"Replayed {applied} trades from {journal.path}, skipped {failed}")
+    return applied
+
+
+class Snapshotter:
+    """Clock listener that saves a snapshot every `every` periods"""
+    def __init__(self, directory: str, every: int = 1000):
+        self.directory = directory
+        self.every = every
+        self._last = None
+
+    def __call__(self, game: Game):
+        period = game.current_period
+        if self._last is None:
+            self._last = period
+        if period - self._last >= self.every:
+            save_snapshot(game, self.directory)
+            self._last = period
@@ -0,0 +1,260 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+
+import numpy as np
+
+from GARCH import price_figure
+from assets import MarketNotStarted
+from market import Market, MarketSnapshot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    period INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (symbol, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clock (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    period INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS investors (
+    username TEXT PRIMARY KEY,
+    money REAL NOT NULL,
+    settled_period INTEGER NOT NULL,
+    production TEXT NOT NULL,
+    prod_queue TEXT NOT NULL,
+    factories TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS holdings (
+    username TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    PRIMARY KEY (username, symbol)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteStore:
+    """Game state shared by any number of processes through one SQLite database in WAL mode
+
+    One clock process writes prices (see SharedMarket.advance_to), every other process reads them and keeps
+    investors in the database, changing them inside a transaction per request.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(investors)")]
+        if "factories" not in columns:
+            # created before investors could build factories
+            self.conn.execute("ALTER TABLE investors ADD COLUMN factories TEXT NOT NULL DEFAULT '[]'")
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction, takes the database write lock up front so read-modify-write can't race"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def read_transaction(self):
+        """Read transaction, sees one consistent version of the database without taking the write lock"""
+        conn = self.conn
+        conn.execute("BEGIN DEFERRED")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def get_period(self) -> int:
+        row = self.conn.execute("SELECT period FROM clock WHERE id = 0").fetchone()
+        return row[0] if row else None
+
+    def get_seed(self) -> int:
+        """Seed the clock process simulates prices from, None until one has started"""
+        row = self.conn.execute("SELECT value FROM settings WHERE key = 'seed'").fetchone()
+        return int(row[0]) if row else None
+
+    def set_seed(self, seed: int):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('seed', ?)", (str(seed),))
+
+    def write_prices(self, symbols: list[str], periods: np.ndarray, prices: np.ndarray):
+        """Write prices[i, j] for periods[i] and symbols[j] and move the clock to the last period, in one batch"""
+        rows = [
+            (int(period), symbol, float(price))
+            for period, row in zip(periods, prices)
+            for symbol, price in zip(symbols, row)
+        ]
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO prices (period, symbol, price) VALUES (?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO clock (id, period) VALUES (0, ?)", (int(periods[-1]),))
+
+    def read_snapshot(self, period: int) -> MarketSnapshot:
+        rows = self.conn.execute("SELECT symbol, price FROM prices WHERE period = ?", (period,)).fetchall()
+        return MarketSnapshot(period, MappingProxyType(dict(rows)))
+
+    def read_prices(self, symbol: str, start: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        """(periods, prices) of symbol like range()"""
+        rows = self.conn.execute(
+            "SELECT period, price FROM prices WHERE symbol = ? AND period >= ? AND period < ? ORDER BY period",
+            (symbol, start, end)
+        ).fetchall()
+        data = np.array(rows, dtype=float).reshape(-1, 2)
+        return data[:, 0].astype(int), data[:, 1]
+
+    def count_investors(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM investors").fetchone()[0]
+
+    def load_investor(self, conn: sqlite3.Connection, username: str) -> dict:
+        """Investor state as saved by save_investor, None for an unknown username"""
+        row = conn.execute(
+            "SELECT money, settled_period, production, prod_queue, factories FROM investors WHERE username = ?",
+            (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        money, settled_period, production, prod_queue, factories = row
+        holdings = conn.execute("SELECT symbol, qty FROM holdings WHERE username = ?", (username,)).fetchall()
+        return {
+            "money": money,
+            "settled_period": settled_period,
+            "holdings": dict(holdings),
+            "production": json.loads(production),
+            "prod_queue": json.loads(prod_queue),
+            "factories": json.loads(factories),
+        }
+
+    def save_investor(self, conn: sqlite3.Connection, username: str, state: dict):
+        conn.execute(
+            "INSERT OR REPLACE INTO investors (username, money, settled_period, production, prod_queue, factories) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (username, state["money"], state["settled_period"], json.dumps(state["production"]),
+             json.dumps(state["prod_queue"]), json.dumps(state["factories"]))
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO holdings (username, symbol, qty) VALUES (?, ?, ?)",
+            [(username, symbol, qty) for symbol, qty in state["holdings"].items()]
+        )
+
+
+class SharedMarket(Market):
+    """Market backed by a SQLiteStore
+
+    In the clock process (writer=True) it simulates as usual and writes every new period's prices to the
+    store. Everywhere else it never simulates, every price it serves is read from the store's prices table.
+    """
+    def __init__(self, store: SQLiteStore, writer: bool = False, seed=None):
+        self.store = store
+        self.writer = writer
+        if writer:
+            seed = self._writer_seed(seed)
+        super().__init__(seed=seed)
+        if not writer:
+            return
+        period = store.get_period()
+        if period is None:
+            snapshot = self._snapshot
+            self.store.write_prices(self.symbols, np.array([snapshot.period]), np.array([list(snapshot.prices.values())]))
+            return
+        # a restarted clock process: the stored seed simulates the stored prices again, so carry on from the
+        # stored period without writing over the history
+        Market.advance_to(self, period)
+        if dict(self._snapshot.prices) != dict(store.read_snapshot(period).prices):
+            raise RuntimeError(f"Prices simulated to period {period} don't match the ones stored in {store.path}")
+
+    def _writer_seed(self, seed) -> int:
+        """The seed the store's prices were simulated from, kept in the store the first time a clock starts"""
+        stored = self.store.get_seed()
+        if stored is None:
+            # a fresh one unless it was given, either way a restart needs to know it
+            stored = np.random.SeedSequence(seed).entropy
+            self.store.set_seed(stored)
+        elif seed is not None and seed != stored:
+            raise ValueError(f"{self.store.path} was started with seed {stored}, not {seed}")
+        return stored
+
+    def _publish(self, period: int):
+        if self.writer:
+            return super()._publish(period)
+        # readers never simulate, prices only ever come from the clock process through the store
+        stored = self.store.get_period()
+        if stored is None:
+            # nothing written yet, snapshot raises MarketNotStarted until the clock process writes period 0
+            self.snapshot = MarketSnapshot(-1, MappingProxyType({}))
+        else:
+            self.snapshot = self.store.read_snapshot(stored)
+
+    def refresh(self):
+        """Pick up the latest period the clock process has written, readers call it once per request rather
+        than querying the store on every read of snapshot"""
+        if self.writer:
+            return
+        period = self.store.get_period()
+        if period is not None and period != self._snapshot.period:
+            self._snapshot = self.store.read_snapshot(period)
+
+    @property
+    def snapshot(self) -> MarketSnapshot:
+        if not self.writer and self._snapshot.period < 0:
+            self.refresh()
+            if self._snapshot.period < 0:
+                raise MarketNotStarted(f"No prices in {self.store.path} yet, is the clock process running?")
+        return self._snapshot
+
+    @snapshot.setter
+    def snapshot(self, snapshot: MarketSnapshot):
+        self._snapshot = snapshot
+
+    def get_price(self, symbol: str, period: int = None) -> float:
+        if period is None or self.writer:
+            return super().get_price(symbol, period)
+        _, prices = self.store.read_prices(symbol, period, period + 1)
+        if not len(prices):
+            raise IndexError(f"No price for {symbol} at period {period}")
+        return prices[0].tolist()
+
+    def advance_to(self, period: int):
+        if not self.writer:
+            raise RuntimeError("Only the clock process advances a shared market")
+        # compaction keeps at least the last retention.full periods at full resolution, so advancing no further
+        # than that at a time writes every period's price before any of it can be folded into a bar
+        step = min((asset.retention.full for asset in self.assets.values() if asset.retention), default=None)
+        start = self.current_period + 1
+        while start <= period:
+            end = period if step is None else min(period, start + step - 1)
+            super().advance_to(end)
+            columns = [asset.get_prices(start, end + 1) for asset in self.assets.values()]
+            self.store.write_prices(self.symbols, columns[0][0], np.column_stack([prices for _, prices in columns]))
+            start = end + 1
+
+    def gen_price_figure(self, symbol: str, start: int, end: int, points: int = None):
+        if self.writer:
+            return super().gen_price_figure(symbol, start, end, points)
+        if symbol not in self.assets:
+            raise KeyError(symbol)
+        return price_figure(*self.store.read_prices(symbol, start, end), points)
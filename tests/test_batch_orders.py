@@ -0,0 +1,38 @@
+import pytest
+
+from assets import OrderRejected
+from game import Game
+
+
+def test_a_rejected_batch_leaves_the_investor_as_it_was():
+    game = Game(seed=2)
+    game.increment_time(1)
+    with game.investor("ann") as investor:
+        investor.portfolio.money = 1e6
+        investor.build_factory("refinery", 2)
+        investor.portfolio.buy_asset("obtainium", 10)
+        before = investor.get_state()
+        orders = [
+            {"action": "buy", "symbol": "eludium", "qty": 3},
+            {"action": "produce", "symbol": "widget", "qty": 1},
+            {"action": "sell", "symbol": "obtainium", "qty": 100},
+            {"action": "buy", "symbol": "gizmo", "qty": 1},
+        ]
+        with pytest.raises(OrderRejected) as rejected:
+            investor.apply_orders(orders)
+        assert investor.get_state() == before
+    assert [result["status"] for result in rejected.value.results] == ["rolled back", "rolled back", "rejected",
+                                                                       "skipped"]
+
+
+def test_an_accepted_batch_is_applied_at_one_snapshot():
+    game = Game(seed=2)
+    game.increment_time(1)
+    snapshot = game.market.snapshot
+    game.increment_time(5)
+    with game.investor("ann") as investor:
+        results = investor.apply_orders([{"action": "buy", "symbol": "obtainium", "qty": 3},
+                                         {"action": "sell", "symbol": "obtainium", "qty": 1}], snapshot)
+        assert investor.portfolio.get_qty("obtainium") == 2
+        assert investor.portfolio.money == pytest.approx(1000 - 2 * snapshot.prices["obtainium"])
+    assert [result["price"] for result in results] == [snapshot.prices["obtainium"]] * 2
@@ -0,0 +1,100 @@
+from collections import deque
+
+import pytest
+
+from assets import AssetPortfolio
+from factories import Processor, Refinery, advance_jobs, queue_job
+from game import Game
+
+
+def tick_by_tick(jobs: list[tuple[str, int, int]], lines: int, periods: int) -> list[dict]:
+    """Units of each product finished by every period, working one period at a time: the lines take
+    unit_time periods over each batch of up to `lines` units, one job after another"""
+    finished = {product: 0 for product, _, _ in jobs}
+    by_period = [dict(finished)]
+    queue = deque([product, qty, unit_time, 0] for product, qty, unit_time in jobs)
+    for _ in range(periods):
+        if queue:
+            job = queue[0]
+            job[3] += 1
+            if job[3] == job[2]:
+                batch = min(lines, job[1])
+                finished[job[0]] += batch
+                job[1] -= batch
+                job[3] = 0
+                if job[1] == 0:
+                    queue.popleft()
+        by_period.append(dict(finished))
+    return by_period
+
+
+@pytest.fixture(scope="module")
+def market():
+    return Game(seed=1).market
+
+
+@pytest.mark.parametrize("lines", [1, 3, 4])
+def test_factory_delivers_like_working_each_period(market, lines):
+    refinery = Refinery(lines)
+    orders = [("widget", 7), ("gizmo", 5), ("widget", 2)]
+    for product, qty in orders:
+        refinery.queue(market.get_recipe(product), qty, 0)
+    expected = tick_by_tick([(product, qty, market.get_recipe(product).time) for product, qty in orders], lines,
+                            200)
+    portfolio = AssetPortfolio(market=market)
+    for period, finished in enumerate(expected):
+        refinery.advance(period, portfolio)
+        assert {product: portfolio.get_qty(product) for product in finished} == finished
+    assert not refinery.jobs
+
+
+def test_finish_time_is_the_last_delivery(market):
+    processor = Processor(2)
+    recipe = market.get_recipe("doohickey")
+    eta = processor.finish_time(recipe, 5, 3)
+    assert eta == 3 + 3 * recipe.time
+    processor.queue(recipe, 5, 3)
+    portfolio = AssetPortfolio(market=market)
+    processor.advance(eta - 1, portfolio)
+    assert portfolio.get_qty("doohickey") == 4
+    processor.advance(eta, portfolio)
+    assert portfolio.get_qty("doohickey") == 5
+
+
+def test_same_product_straight_after_is_one_job(market):
+    jobs = deque()
+    recipe = market.get_recipe("widget")
+    queue_job(jobs, recipe, 4, 0, lines=2)
+    queue_job(jobs, recipe, 3, 0, lines=2)
+    assert len(jobs) == 1 and jobs[0].qty == 7
+    portfolio = AssetPortfolio(market=market)
+    advance_jobs(jobs, jobs[0].eta, portfolio)
+    assert portfolio.get_qty("widget") == 7 and not jobs
+
+
+def test_investor_queues_on_the_faster_factory():
+    game = Game(seed=1)
+    game.increment_time(2)
+    with game.investor("ann") as investor:
+        investor.portfolio.money = 1e7
+        investor.build_factory("refinery", 3)
+        investor.produce_asset("widget", 7, autobuy=True)
+        start = investor.settled_period
+        assert not investor.prod_queue and len(investor.factories[0].jobs) == 1
+    unit_time = game.market.get_recipe("widget").time
+    expected = tick_by_tick([("widget", 7, unit_time)], 3, 4 * unit_time)
+    for period, finished in enumerate(expected):
+        game.increment_time(start + period - game.current_period)
+        with game.investor("ann") as investor:
+            assert investor.portfolio.get_qty("widget") == finished["widget"]
+
+
+@pytest.mark.parametrize("kind, lines", [(["refinery"], 1), ({"refinery": 1}, 1), ("smelter", 1),
+                                         ("refinery", 0), ("refinery", "2"), ("refinery", 1.5)])
+def test_malformed_factories_are_rejected(kind, lines):
+    game = Game(seed=1)
+    with game.investor("ann") as investor:
+        investor.portfolio.money = 1e6
+        with pytest.raises(ValueError):
+            investor.build_factory(kind, lines)
+        assert investor.factories == [] and investor.portfolio.money == 1e6
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from GARCH import GARCH
+
+
+def biased_asset():
+    asset = GARCH(100, b=0.25, c=0.2)
+    asset.bias_threshold = 0.01
+    return asset
+
+
+def test_monte_carlo_is_reproducible_from_its_seed():
+    result = biased_asset().monte_carlo(it=200, n=2000, seed=1, distribution=True)
+    returns = result["distribution"]
+    assert returns.mean() == pytest.approx(0.0819793983269149)
+    assert returns.std() == pytest.approx(2.157450295281369)
+    assert (result["min"], result["avg"], result["max"]) == (-6.32, 0.08, 5.43)
+    np.testing.assert_allclose(result["quint"], [-6.31721359, -1.46925518, 0.12160944, 1.4787171, 5.43260309])
+    assert result["run_bias"] == pytest.approx(1.0185441168527867)
+
+
+def test_monte_carlo_bias_is_the_running_total():
+    asset = biased_asset()
+    first = asset.monte_carlo(it=200, n=2000, seed=1)
+    second = asset.monte_carlo(it=200, n=2000, seed=2)
+    assert first["bias"] == first["run_bias"]
+    assert second["bias"] == pytest.approx(first["run_bias"] + second["run_bias"])
+    assert second["bias"] == asset.total_bias_generated
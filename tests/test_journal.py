@@ -0,0 +1,90 @@
+import json
+
+from game import Game
+from snapshot import TradeJournal, load_snapshot, save_snapshot
+
+
+def trade(game, username, action, symbol, qty):
+    with game.investor(username) as investor:
+        if action == "buy":
+            price = investor.portfolio.buy_asset(symbol, qty)
+        else:
+            price = investor.portfolio.sell_asset(symbol, qty)
+        game.record(username, investor, action, symbol, qty, price)
+
+
+def played_game(tmp_path):
+    game = Game(seed=7)
+    game.journal = TradeJournal(str(tmp_path / "trades.jsonl"))
+    game.increment_time(5)
+    trade(game, "ann", "buy", "obtainium", 2)
+    trade(game, "bob", "buy", "obtainium", 1)
+    return game
+
+
+def test_snapshot_rotates_the_journal(tmp_path):
+    game = played_game(tmp_path)
+    save_snapshot(game, str(tmp_path))
+    assert list(game.journal.read()) == []
+    game.increment_time(3)
+    trade(game, "ann", "sell", "obtainium", 1)
+    assert [entry["seq"] for entry in game.journal.read()] == [3]
+    game.journal.close()
+
+    journal = TradeJournal(str(tmp_path / "trades.jsonl"))
+    restored = load_snapshot(str(tmp_path), journal)
+    assert journal.seq == 3
+    for username in ("ann", "bob"):
+        before, after = game.add_investor(username).get_state(), restored.add_investor(username).get_state()
+        assert (after["money"], after["holdings"]) == (before["money"], before["holdings"])
+    journal.close()
+
+
+def test_journal_keeps_numbering_after_an_empty_rotation(tmp_path):
+    game = played_game(tmp_path)
+    save_snapshot(game, str(tmp_path))
+    game.journal.close()
+
+    journal = TradeJournal(str(tmp_path / "trades.jsonl"))
+    assert journal.seq == 0
+    restored = load_snapshot(str(tmp_path), journal)
+    restored.journal = journal
+    trade(restored, "ann", "buy", "obtainium", 1)
+    assert [entry["seq"] for entry in journal.read()] == [3]
+    journal.close()
+
+
+def test_torn_entry_is_cut_off(tmp_path):
+    game = played_game(tmp_path)
+    game.journal.close()
+    path = tmp_path / "trades.jsonl"
+    with open(path, "a") as f:
+        f.write('{"seq": 3, "period": 5, "userna')
+
+    journal = TradeJournal(str(path))
+    assert journal.seq == 2
+    journal.append({"period": 5, "username": "ann", "action": "sell", "symbol": "obtainium", "qty": 1, "price": 1.0})
+    journal.close()
+    with open(path) as f:
+        assert [json.loads(line)["seq"] for line in f] == [1, 2, 3]
+
+
+def test_replay_skips_entries_that_no_longer_apply(tmp_path):
+    game = played_game(tmp_path)
+    save_snapshot(game, str(tmp_path))
+    trade(game, "bob", "sell", "obtainium", 1)
+    game.journal.append({"period": 5, "username": "ann", "action": "sell", "symbol": "obtainium", "qty": 50,
+                         "price": 1.0})
+    game.journal.close()
+    with open(tmp_path / "trades.jsonl", "a") as f:
+        f.write('{"seq": 5, "period": 5, "userna\n')
+        f.write(json.dumps({"seq": 6, "period": 5, "username": "ann", "action": "buy", "symbol": "obtainium",
+                            "qty": 1, "price": 2.0}) + "\n")
+
+    journal = TradeJournal(str(tmp_path / "trades.jsonl"))
+    restored = load_snapshot(str(tmp_path), journal)
+    journal.close()
+    ann, bob = restored.add_investor("ann"), restored.add_investor("bob")
+    assert ann.journal_seq == 6
+    assert ann.portfolio.get_qty("obtainium") == 3
+    assert bob.portfolio.get_qty("obtainium") == 0
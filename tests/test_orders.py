@@ -0,0 +1,76 @@
+import pytest
+
+from game import Game
+from orders import OrderBook
+
+
+def book_with(*orders) -> tuple[OrderBook, dict]:
+    """OrderBook with a widget order per (action, order_type, price), and their ids by the same key"""
+    book = OrderBook()
+    ids = {order: book.place("ann", order[0], "widget", 1, order[1], order[2], 0).id for order in orders}
+    return book, ids
+
+
+@pytest.mark.parametrize("action, order_type, trigger, crossing, not_crossing", [
+    ("buy", "limit", 90, 90, 90.01),
+    ("buy", "stop", 110, 110, 109.99),
+    ("sell", "limit", 110, 110, 109.99),
+    ("sell", "stop", 90, 90, 90.01),
+    ("produce", "limit", 110, 110, 109.99),
+])
+def test_order_fills_once_the_price_reaches_its_trigger(action, order_type, trigger, crossing, not_crossing):
+    book, _ = book_with((action, order_type, trigger))
+    assert book.crossed({"widget": not_crossing}) == []
+    assert len(book) == 1
+    [order] = book.crossed({"widget": crossing})
+    assert (order.action, order.order_type, order.price) == (action, order_type, trigger)
+    assert len(book) == 0
+    assert book.crossed({"widget": crossing}) == []
+
+
+def test_crossed_orders_come_oldest_first():
+    book, ids = book_with(("sell", "limit", 105), ("buy", "stop", 101), ("sell", "limit", 101),
+                          ("buy", "limit", 99), ("sell", "stop", 95))
+    crossed = book.crossed({"widget": 106, "gizmo": 1})
+    assert [order.id for order in crossed] == [ids["sell", "limit", 105], ids["buy", "stop", 101],
+                                               ids["sell", "limit", 101]]
+    assert [order["id"] for order in book.get_orders("ann")] == [ids["buy", "limit", 99], ids["sell", "stop", 95]]
+
+
+def test_orders_saved_with_type_still_load():
+    book = OrderBook()
+    book.set_state([{"id": 4, "username": "ann", "action": "sell", "symbol": "widget", "qty": 1, "type": "stop",
+                     "price": 80.0, "period": 2}])
+    assert book.get_orders("ann")[0]["order_type"] == "stop"
+    assert [order.id for order in book.crossed({"widget": 79})] == [4]
+
+
+def test_game_fills_crossed_orders_at_the_new_price():
+    game = Game(seed=2)
+    game.increment_time(1)
+    price = game.market.snapshot.prices["obtainium"]
+    with game.investor("ann") as investor:
+        game.place_order("ann", investor, "buy", "obtainium", 2, "limit", price * 10)
+        game.place_order("ann", investor, "buy", "obtainium", 1000, "limit", price * 10)
+        game.place_order("ann", investor, "buy", "obtainium", 1, "limit", price / 10)
+    game.increment_time(1)
+    snapshot = game.market.snapshot
+    filled, failed = game.orders.get_history("ann")
+    assert filled["status"] == "filled" and filled["fill_price"] == snapshot.prices["obtainium"]
+    assert failed["status"] == "failed"
+    assert len(game.orders.get_orders("ann")) == 1
+    with game.investor("ann") as investor:
+        assert investor.portfolio.get_qty("obtainium") == 2
+        assert investor.portfolio.money == pytest.approx(1000 - 2 * snapshot.prices["obtainium"])
+
+
+@pytest.mark.parametrize("field, value", [
+    ("symbol", ["widget"]), ("symbol", {"widget": 1}), ("symbol", "unknownium"), ("action", ["buy"]),
+    ("order_type", {"limit": 1}), ("qty", "2"), ("qty", [2]), ("price", "95"), ("price", None),
+])
+def test_malformed_orders_are_rejected(field, value):
+    game = Game(seed=2)
+    order = {"action": "buy", "symbol": "widget", "qty": 2, "order_type": "limit", "price": 95.0, field: value}
+    with game.investor("ann") as investor, pytest.raises(ValueError):
+        game.place_order("ann", investor, **order)
+    assert len(game.orders) == 0
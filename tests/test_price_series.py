@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from price_series import PriceSeries, Retention, decimate
+
+RETENTION = Retention(full=10, tiers=((5, 4), (20, 3)))
+
+
+def bars(prices: np.ndarray, width: int) -> dict[str, np.ndarray]:
+    grouped = prices.reshape(-1, width)
+    return {"open": grouped[:, 0], "high": grouped.max(axis=1), "low": grouped.min(axis=1),
+            "close": grouped[:, -1]}
+
+
+def filled(n: int, step: int, seed: int = 5) -> tuple[PriceSeries, np.ndarray]:
+    """Series of n random prices appended step periods at a time and compacted after each, and every price"""
+    prices = 100 + np.random.default_rng(seed).standard_normal(n).cumsum()
+    series = PriceSeries(capacity=4, retention=RETENTION)
+    for start in range(0, n, step):
+        chunk = prices[start:start + step]
+        series.extend(len(chunk))["price"][-len(chunk):] = chunk
+        series.compact()
+    return series, prices
+
+
+@pytest.mark.parametrize("step", [1, 3, 7, 50])
+def test_compaction_matches_bars_of_every_price(step):
+    series, prices = filled(400, step)
+    assert len(series) == len(prices)
+    assert series.offset > 0 and len(series.tiers[1]) > 0
+    np.testing.assert_array_equal(series.view("price"), prices[series.offset:])
+    for tier in series.tiers:
+        expected = bars(prices[tier.start:tier.end], tier.width)
+        for field in tier.FIELDS:
+            np.testing.assert_array_equal(tier.data[field], expected[field])
+        assert len(tier) <= tier.max_bars
+    assert series.tiers[0].end == series.offset
+    assert series.tiers[1].end == series.tiers[0].start
+
+
+def test_compacted_prices_read_back_as_bar_closes():
+    series, prices = filled(400, 7)
+    oldest = series.tiers[1].start
+    with pytest.raises(IndexError):
+        series.price_at(oldest - 1)
+    for period in range(oldest, len(prices)):
+        tier = next((tier for tier in series.tiers if tier.start <= period < tier.end), None)
+        close = period
+        if tier is not None:
+            # the last period of its bar
+            close = tier.start + ((period - tier.start) // tier.width + 1) * tier.width - 1
+        assert series.price_at(period) == prices[close]
+    periods, closes = series.closes(0, len(prices))
+    assert periods[0] == oldest and periods[-1] == len(prices) - 1
+    assert np.all(np.diff(periods) > 0)
+    np.testing.assert_array_equal(closes, [series.price_at(period) for period in periods])
+
+
+def test_compaction_waits_for_twice_the_full_window():
+    series, prices = filled(2 * RETENTION.full - 1, 1)
+    assert series.offset == 0
+    np.testing.assert_array_equal(series.view("price"), prices)
+
+
+def test_layout_changes_exactly_when_a_range_would_read_differently():
+    series = PriceSeries(capacity=4, retention=RETENTION)
+    rng = np.random.default_rng(3)
+    for _ in range(300):
+        series.extend(1)["price"][-1] = 100 + rng.standard_normal()
+        before = (series.layout, series.closes(0, len(series) - 1))
+        series.compact()
+        after = (series.layout, series.closes(0, len(series) - 1))
+        if before[0] == after[0]:
+            np.testing.assert_array_equal(before[1][0], after[1][0])
+            np.testing.assert_array_equal(before[1][1], after[1][1])
+        else:
+            assert len(before[1][0]) != len(after[1][0])
+
+
+def test_decimate_keeps_the_extremes_of_every_bucket():
+    prices = 100 + np.random.default_rng(11).standard_normal(1000).cumsum()
+    prices[613] = 1000.0
+    prices[87] = -50.0
+    periods = np.arange(1000) * 3
+    kept_periods, kept_prices = decimate(periods, prices, 100)
+    assert len(kept_prices) <= 100
+    assert np.all(np.diff(kept_periods) > 0)
+    np.testing.assert_array_equal(kept_prices, prices[kept_periods // 3])
+    assert 1000.0 in kept_prices and -50.0 in kept_prices
+    buckets = np.array_split(prices, 50)
+    for bucket in buckets:
+        assert bucket.max() in kept_prices and bucket.min() in kept_prices
+
+
+def test_decimate_leaves_short_series_alone():
+    periods, prices = np.arange(50), np.linspace(1, 2, 50)
+    kept_periods, kept_prices = decimate(periods, prices, 100)
+    assert kept_periods is periods and kept_prices is prices
@@ -0,0 +1,47 @@
+import pytest
+
+from assets import MarketNotStarted
+from game import Game
+from store import SQLiteStore
+
+
+def test_factories_are_kept_between_requests(tmp_path):
+    path = str(tmp_path / "game.db")
+    clock = Game(store=SQLiteStore(path), writer=True, seed=1)
+    clock.increment_time(3)
+    worker = Game(store=SQLiteStore(path))
+    with worker.investor("ann") as investor:
+        investor.portfolio.money = 1e6
+        investor.build_factory("refinery", 2)
+        investor.produce_asset("widget", 4, autobuy=True)
+        expected = investor.get_factories()
+
+    with Game(store=SQLiteStore(path)).investor("ann", read_only=True) as investor:
+        assert investor.get_factories() == expected
+        assert investor.get_factories()[0]["lines"] == 2
+
+
+def test_readers_wait_for_the_clock_process(tmp_path):
+    path = str(tmp_path / "game.db")
+    worker = Game(store=SQLiteStore(path))
+    with pytest.raises(MarketNotStarted):
+        worker.market.snapshot
+    clock = Game(store=SQLiteStore(path), writer=True, seed=1)
+    assert worker.market.snapshot == clock.market.snapshot
+    clock.increment_time(2)
+    # a reader only looks for new periods when it's refreshed, once per request
+    assert worker.market.snapshot.period == 0
+    worker.market.refresh()
+    assert worker.market.snapshot == clock.market.snapshot
+
+
+def test_a_long_catch_up_stores_every_period(tmp_path):
+    path = str(tmp_path / "game.db")
+    clock = Game(store=SQLiteStore(path), writer=True, seed=1)
+    full = clock.market.assets["widget"].retention.full
+    # far enough in one go that the start of it is compacted into bars in memory
+    clock.increment_time(2 * full + 100)
+    assert clock.market.assets["widget"]._series.offset > 0
+    periods, prices = SQLiteStore(path).read_prices("widget", 0, clock.current_period + 1)
+    assert periods.tolist() == list(range(clock.current_period + 1))
+    assert prices[-1] == clock.market.snapshot.prices["widget"]